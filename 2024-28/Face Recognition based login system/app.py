@@ -1,8 +1,11 @@
 import os
+import multiprocessing
 
 from flask import Flask,jsonify,render_template
 from flask_jwt_extended import JWTManager  # type: ignore
 from auth import auth_bp
+from gallery import gallery
+from inference import engine
 
 app=Flask(__name__)
 app.config['SECRET_KEY']=os.getenv('SECRET_KEY','dev-secret-key')
@@ -23,6 +26,28 @@ def home():
 def health_check():
     return jsonify({"message":"Server running well"})
 
+@app.route('/health/inference')
+def inference_stats():
+    return jsonify(engine.stats())
+
+def is_reloader_parent():
+    """True in the debug reloader's watcher process, which never serves requests."""
+    debug=__name__=="__main__" or os.getenv("FLASK_DEBUG","").lower() in ("1","true")
+    return debug and os.environ.get("WERKZEUG_RUN_MAIN")!="true"
+
+def start_services():
+    """Load the gallery and warm up the inference workers before the first login."""
+    gallery.start()
+    engine.start()
+
+def is_worker_process():
+    """Inference workers re-import this file as __mp_main__ while spawning."""
+    return __name__=="__mp_main__" or multiprocessing.parent_process() is not None
+
+# Every serving process (python app.py, flask run, a WSGI server) preloads at startup
+if not is_worker_process() and not is_reloader_parent():
+    start_services()
+
 if __name__=="__main__":
     app.run(debug=True)
 
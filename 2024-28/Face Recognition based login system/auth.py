@@ -2,9 +2,9 @@ from flask import Blueprint,request,jsonify,session,render_template
 from flask_jwt_extended import create_access_token #type: ignore
 from werkzeug.security import generate_password_hash,check_password_hash
 from dotenv import load_dotenv
-from utils import get_embeddings,compare_embeddings,decode_base64_image,load_users,save_users,embedding_dir as DEFAULT_EMBEDDING_DIR
-import numpy as np
-import os
+from utils import decode_base64_image,decode_image_bytes,user_store,identify_threshold,identify_min_margin,match_threshold
+from gallery import gallery
+from inference import engine
 
 
 load_dotenv()
@@ -12,6 +12,51 @@ load_dotenv()
 
 auth_bp=Blueprint("Auth",__name__)
 
+# Upper bound on snapshots accepted in one enrollment request
+MAX_ENROLL_IMAGES = 10
+
+def read_face_request():
+    """Return (fields, face) for a JSON, multipart/form-data or application/octet-stream request.
+
+    Binary uploads give the raw image bytes (other fields come from the form
+    or, for octet-stream, the query string); JSON gives the base64 string.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('face_image')
+        return request.form.to_dict(), (upload.read() if upload else None)
+    if request.mimetype == 'application/octet-stream':
+        return request.args.to_dict(), (request.get_data() or None)
+    data = request.get_json(silent=True) or {}
+    return data, data.get("face_image")
+
+
+def read_faces_request():
+    """Like read_face_request, but for several snapshots (enrollment).
+
+    Multipart requests may repeat the ``face_image`` part; JSON may send a
+    ``face_images`` list and/or a single ``face_image``.
+    """
+    if request.mimetype == 'multipart/form-data':
+        return request.form.to_dict(), [f.read() for f in request.files.getlist('face_image')]
+    data = request.get_json(silent=True) or {}
+    faces = list(data.get("face_images") or [])
+    if data.get("face_image"):
+        faces.append(data["face_image"])
+    return data, faces
+
+
+def embed_faces(faces):
+    """Decode and embed enrollment snapshots, returning the usable embeddings."""
+    images = [img for img in (decode_face(f) for f in faces[:MAX_ENROLL_IMAGES]) if img is not None]
+    return [emb for emb in engine.embed_many(images) if emb is not None] if images else []
+
+
+def decode_face(face):
+    if isinstance(face, (bytes, bytearray)):
+        return decode_image_bytes(face)
+    return decode_base64_image(image=face)
+
+
 """Creating the register route"""
 @auth_bp.route("/dashboard", methods=['GET'])
 def dashboard():
@@ -23,23 +68,17 @@ def dashboard():
     if isinstance(token_value, str) and token_value:
         token_preview = f"{token_value[:18]}…{token_value[-6:]}" if len(token_value) > 32 else token_value
 
-    face_ready = False
-    if username:
-        embeddings_dir = os.getenv("EMBEDDINGS_DIR") or os.getenv("EMBEDDING_DIR") or DEFAULT_EMBEDDING_DIR
-        if embeddings_dir:
-            embedding_path = os.path.join(embeddings_dir, f"{username}.npy")
-            face_ready = os.path.exists(embedding_path)
+    face_ready = bool(username) and username in gallery
 
     return render_template('dashboard.html', username=username, face_ready=face_ready, token_preview=token_preview)
 
 
 @auth_bp.route("/login_face", methods=['POST'])
 def login_face():
-    data = request.get_json(silent=True) or {}
+    data, face = read_face_request()
 
     # ✅ kept the fallback for 'usernmae' but corrected logic order
     username = (data.get("username") or data.get("usernmae") or "").strip()
-    face = data.get("face_image")
     attempt_value = data.get('attempt', 1)
 
     try:
@@ -56,34 +95,27 @@ def login_face():
     if issues:
         return jsonify({'status': 'error', 'message': issues[0], 'messages': issues}), 400
 
-    users = load_users() or {}
-    if username not in users:
+    if username not in user_store:
         return jsonify({'status': 'error', 'message': 'User not found.'}), 404
 
-    img = decode_base64_image(image=face)
+    img = decode_face(face)
     if img is None:
         if attempt < 3:
             return jsonify({'status': 'retry', 'message': f'Unable to read face. {3 - attempt} attempt(s) left.', 'attempt': attempt + 1}), 401
         return jsonify({'status': 'error', 'message': 'Unable to read facial data. Use credential login instead.'}), 401
 
-    embedding = get_embeddings(image=img)
+    embedding = engine.embed(img)
     if embedding is None:
         if attempt < 3:
             return jsonify({'status': 'retry', 'message': f'Face not recognized. {3 - attempt} attempt(s) left.', 'attempt': attempt + 1}), 401
         return jsonify({'status': 'error', 'message': 'Face authentication failed. Use credential login.'}), 401
 
-    embeddings_dir = os.getenv("EMBEDDINGS_DIR") or os.getenv("EMBEDDING_DIR") or DEFAULT_EMBEDDING_DIR
-    if not embeddings_dir:
-        return jsonify({'status': 'error', 'message': 'Embeddings directory is not configured on the server.'}), 500
-
-    os.makedirs(embeddings_dir, exist_ok=True)
-    embedding_path = os.path.join(embeddings_dir, f"{username}.npy")
-    if not os.path.exists(embedding_path):
+    # Templates are served from the in-memory gallery, no disk access here
+    score = gallery.verify(username, embedding)
+    if score is None:
         return jsonify({'status': 'error', 'message': 'No stored embedding found. Please re-register.'}), 404
 
-    stored_emb = np.load(embedding_path)
-
-    if not compare_embeddings(emb1=embedding, emb2=stored_emb):
+    if score < match_threshold:
         if attempt < 3:
             return jsonify({'status': 'retry', 'message': f'Face not recognized. {3 - attempt} attempt(s) left.', 'attempt': attempt + 1}), 401
         return jsonify({'status': 'error', 'message': 'Face authentication failed. Use credential login.'}), 401
@@ -95,129 +127,98 @@ def login_face():
     return jsonify({'status': 'success', 'message': 'Authentication successful.'})
 
 
-@auth_bp.route("/login_cred", methods=['POST'])
-def login_cred():
-    data = request.get_json(silent=True) or {}
+@auth_bp.route("/register", methods=['POST'])
+def register():
+    """Create an account and enroll one or more face snapshots as templates."""
+    data, faces = read_faces_request()
 
     username = (data.get("username") or "").strip()
-    password_value = data.get("password")
-    password = password_value if isinstance(password_value, str) else ""
+    password = data.get("password") or ""
+    confirm_password = data.get("confirm_password") or ""
 
     issues = []
     if not username:
         issues.append("Username is required.")
-    if not password:
-        issues.append("Password is required.")
+    if len(password) < 8:
+        issues.append("Password must be at least 8 characters.")
+    if password != confirm_password:
+        issues.append("Passwords do not match.")
+    if not faces:
+        issues.append("Face snapshot missing.")
 
     if issues:
         return jsonify({'status': 'error', 'message': issues[0], 'messages': issues}), 400
 
-    users = load_users() or {}
+    if username in user_store:
+        return jsonify({'status': 'error', 'message': 'Username already exists.'}), 409
 
-    if username not in users:
-        return jsonify({'status': 'error', 'message': 'User not found.'}), 404
-
-    hashed_pass = users[username].get('password')
-    if not hashed_pass or not check_password_hash(hashed_pass, password=password):
-        return jsonify({'status': 'error', 'message': 'Incorrect username or password.'}), 401
-
-    token = create_access_token(identity=username)
-    session['username'] = username
-    # 🔧 Consistent fix
-    session['access_token'] = token
+    embeddings = embed_faces(faces)
+    if not embeddings:
+        return jsonify({'status': 'error', 'message': 'No face detected. Retake the snapshot.'}), 422
 
-    return jsonify({'status': 'success', 'message': 'Credential login successful.'})
+    user_store.set(username, {'password': generate_password_hash(password)})
+    templates = gallery.enroll(username, embeddings, replace=True)
+    return jsonify({'status': 'success', 'message': 'Registration successful.', 'templates': templates}), 201
 
-@auth_bp.route("/login", methods=['GET'])
-def login_page():
-    return render_template('login.html')
 
-@auth_bp.route("/dashboard", methods=['GET'])
-def dashboard():
+@auth_bp.route("/enroll_face", methods=['POST'])
+def enroll_face():
+    """Add face templates for the logged-in user (oldest ones roll off)."""
     username = session.get('username')
-    token_value = session.get('access token')
-
-    token_preview = None
-    if isinstance(token_value, str) and token_value:
-        token_preview = f"{token_value[:18]}…{token_value[-6:]}" if len(token_value) > 32 else token_value
+    if not username:
+        return jsonify({'status': 'error', 'message': 'Login required.'}), 401
 
-    face_ready = False
-    if username:
-        embeddings_dir = os.getenv("EMBEDDINGS_DIR") or os.getenv("EMBEDDING_DIR") or DEFAULT_EMBEDDING_DIR
-        if embeddings_dir:
-            embedding_path = os.path.join(embeddings_dir, f"{username}.npy")
-            face_ready = os.path.exists(embedding_path)
+    _, faces = read_faces_request()
+    if not faces:
+        return jsonify({'status': 'error', 'message': 'Face snapshot missing.'}), 400
 
-    return render_template('dashboard.html', username=username, face_ready=face_ready, token_preview=token_preview)
+    embeddings = embed_faces(faces)
+    if not embeddings:
+        return jsonify({'status': 'error', 'message': 'No face detected. Retake the snapshot.'}), 422
 
-@auth_bp.route("/login_face",methods=['POST'])
-def login_face():
-    """
-    Authenticate user via facial recognition.
-    Performs up to 3 retry attempts before fallback to credential login.
-    """
-    data = request.get_json(silent=True) or {}
+    templates = gallery.enroll(username, embeddings)
+    return jsonify({'status': 'success', 'message': 'Face templates updated.', 'templates': templates})
 
-    username = (data.get("username") or data.get("usernmae") or "").strip()
-    face = data.get("face_image")
-    attempt_value = data.get('attempt', 1)
 
-    try:
-        attempt = int(attempt_value)
-    except (TypeError, ValueError):
-        attempt = 1
+@auth_bp.route("/identify_face", methods=['POST'])
+def identify_face():
+    """Log in by face alone: match the snapshot against every enrolled user."""
+    _, face = read_face_request()
 
-    issues = []
-    if not username:
-        issues.append("Username is required.")
     if not face:
-        issues.append("Face snapshot missing.")
+        return jsonify({'status': 'error', 'message': 'Face snapshot missing.'}), 400
 
-    if issues:
-        return jsonify({'status': 'error', 'message': issues[0], 'messages': issues}), 400
-
-    users = load_users() or {}
-    if username not in users:
-        return jsonify({'status': 'error', 'message': 'User not found.'}), 404
-
-    img = decode_base64_image(image=face)
+    img = decode_face(face)
     if img is None:
-        if attempt < 3:
-            return jsonify({'status': 'retry', 'message': f'Unable to read face. {3 - attempt} attempt(s) left.', 'attempt': attempt + 1}), 401
-        return jsonify({'status': 'error', 'message': 'Unable to read facial data. Use credential login instead.'}), 401
+        return jsonify({'status': 'retry', 'message': 'Unable to read face.'}), 401
 
-    embedding = get_embeddings(image=img)
+    embedding = engine.embed(img)
     if embedding is None:
-        if attempt < 3:
-            return jsonify({'status': 'retry', 'message': f'Face not recognized. {3 - attempt} attempt(s) left.', 'attempt': attempt + 1}), 401
-        return jsonify({'status': 'error', 'message': 'Face authentication failed. Use credential login.'}), 401
-
-    # embeddings_dir = os.getenv("EMBEDDINGS_DIR") or os.getenv("EMBEDDING_DIR")
-    embeddings_dir = os.getenv("EMBEDDINGS_DIR") or os.getenv("EMBEDDING_DIR") or DEFAULT_EMBEDDING_DIR
-    if not embeddings_dir:
-        return jsonify({'status': 'error', 'message': 'Embeddings directory is not configured on the server.'}), 500
+        return jsonify({'status': 'retry', 'message': 'No face detected.'}), 401
 
-    embedding_path = os.path.join(embeddings_dir, f"{username}.npy")
+    match = gallery.identify(embedding)
+    if match is None:
+        return jsonify({'status': 'error', 'message': 'No enrolled users.'}), 404
 
-    # Added: existence and file integrity checks
-    if not os.path.exists(embedding_path):
-        return jsonify({'status': 'error', 'message': 'No stored embedding found. Please re-register.'}), 404
-
-    stored_emb = np.load(embedding_path)
-
-    # Safe embedding comparison
-    if not compare_embeddings(emb1=embedding, emb2=stored_emb):
-        if attempt < 3:
-            return jsonify({'status': 'retry', 'message': f'Face not recognized. {3 - attempt} attempt(s) left.', 'attempt': attempt + 1}), 401
-        return jsonify({'status': 'error', 'message': 'Face authentication failed. Use credential login.'}), 401
+    # Reject weak matches and ones too close to a second user to be trusted
+    margin = match['margin']
+    if match['score'] < identify_threshold or (margin is not None and margin < identify_min_margin):
+        return jsonify({'status': 'retry', 'message': 'Face not recognized.', 'score': match['score'], 'margin': margin}), 401
 
-    # Token creation and session handling
+    username = match['username']
     token = create_access_token(identity=username)
     session['username'] = username
-    session['access token'] = token
-    return jsonify({'status': 'success', 'message': 'Authentication successful.'})
+    session['access_token'] = token
+    return jsonify({
+        'status': 'success',
+        'message': 'Authentication successful.',
+        'username': username,
+        'score': match['score'],
+        'margin': margin,
+    })
+
 
-@auth_bp.route("/login_cred",methods=['POST'])
+@auth_bp.route("/login_cred", methods=['POST'])
 def login_cred():
     data = request.get_json(silent=True) or {}
 
@@ -234,20 +235,22 @@ def login_cred():
     if issues:
         return jsonify({'status': 'error', 'message': issues[0], 'messages': issues}), 400
 
-    users = load_users() or {}
+    user = user_store.get(username)
 
-    if username not in users:
+    if user is None:
         return jsonify({'status': 'error', 'message': 'User not found.'}), 404
 
-    hashed_pass = users[username].get('password')
+    hashed_pass = user.get('password')
     if not hashed_pass or not check_password_hash(hashed_pass, password=password):
         return jsonify({'status': 'error', 'message': 'Incorrect username or password.'}), 401
 
     token = create_access_token(identity=username)
     session['username'] = username
-    session['access token'] = token
+    # 🔧 Consistent fix
+    session['access_token'] = token
 
     return jsonify({'status': 'success', 'message': 'Credential login successful.'})
 
-
-
+@auth_bp.route("/login", methods=['GET'])
+def login_page():
+    return render_template('login.html')
@@ -0,0 +1,188 @@
+"""Per-stage latency benchmark for the face login pipeline.
+
+Replays a directory of face images through the same steps as /login_face:
+base64 decode -> image decode -> face detection -> Facenet embedding ->
+gallery scoring, and reports p50/p95 per stage plus throughput. Several
+detector backends can be compared in one run.
+
+Scoring goes through a temporary EmbeddingGallery, like the app: ``verify``
+is the 1:1 login against the first image's user and ``identify`` the 1:N
+search, over a gallery padded with ``--gallery-size`` random users (large
+galleries use the IVF index, as in production).
+
+Usage:
+    python benchmark.py path/to/faces --backends opencv,retinaface,mtcnn --concurrency 4
+    python benchmark.py path/to/faces --gallery-size 20000
+    python benchmark.py path/to/faces --profile login.prof
+"""
+import os
+import sys
+import time
+import glob
+import base64
+import cProfile
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from deepface import DeepFace  # type: ignore
+
+from utils import decode_image_bytes, preprocess_face, model_name
+from gallery import EmbeddingGallery, normalize_rows
+
+
+STAGES = ["base64_decode", "image_decode", "detection", "embedding", "verify", "identify", "total"]
+REFERENCE_USER = "reference"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def load_payloads(directory: str, limit: Optional[int]) -> List[str]:
+    """Read the images and base64-encode them like the browser does."""
+    paths = sorted(p for p in glob.glob(os.path.join(directory, "**", "*"), recursive=True)
+                   if p.lower().endswith(IMAGE_EXTENSIONS))
+    if limit:
+        paths = paths[:limit]
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append(base64.b64encode(f.read()).decode("ascii"))
+    return payloads
+
+
+def build_gallery(directory: str, reference: np.ndarray, size: int) -> EmbeddingGallery:
+    """Gallery with ``reference`` enrolled as REFERENCE_USER plus ``size`` random users."""
+    rng = np.random.default_rng(0)
+    padding = normalize_rows(rng.normal(size=(size, reference.shape[-1])))
+    matrix = np.concatenate([padding, normalize_rows(reference)])
+    table = {f"user{i:06d}": (i, 1) for i in range(size)}
+    table[REFERENCE_USER] = (size, 1)
+    gallery = EmbeddingGallery(os.path.join(directory, "benchmark.fgal"))
+    gallery.file.write(matrix, table)
+    gallery.start()
+    return gallery
+
+
+def run_one(payload: str, backend: str, gallery: Optional[EmbeddingGallery]) -> Tuple[Dict[str, float], Optional[np.ndarray]]:
+    """Push one snapshot through every stage.
+
+    Returns seconds per stage (NaN for stages not reached) and the embedding.
+    Without a gallery (the warm-up run) the scoring stages are skipped.
+    """
+    timings = {stage: float("nan") for stage in STAGES}
+    start = time.perf_counter()
+
+    data = base64.b64decode(payload)
+    t1 = time.perf_counter()
+    timings["base64_decode"] = t1 - start
+
+    img = decode_image_bytes(data)
+    t2 = time.perf_counter()
+    timings["image_decode"] = t2 - t1
+    if img is None:
+        return timings, None
+
+    try:
+        faces = DeepFace.extract_faces(img_path=img, detector_backend=backend, enforce_detection=True, align=True)
+    except Exception:
+        return timings, None
+    t3 = time.perf_counter()
+    timings["detection"] = t3 - t2
+
+    client = DeepFace.build_model(model_name)
+    face = preprocess_face(faces[0]["face"], client.input_shape)
+    emb = np.asarray(client.model(face[None, ...], training=False), dtype=np.float32)[0]
+    emb /= np.linalg.norm(emb)
+    t4 = time.perf_counter()
+    timings["embedding"] = t4 - t3
+
+    if gallery is not None:
+        gallery.verify(REFERENCE_USER, emb)
+        t5 = time.perf_counter()
+        timings["verify"] = t5 - t4
+        gallery.identify(emb)
+        t6 = time.perf_counter()
+        timings["identify"] = t6 - t5
+        timings["total"] = t6 - start
+    else:
+        timings["total"] = t4 - start
+    return timings, emb
+
+
+def bench_backend(payloads: List[str], backend: str, concurrency: int, profile: Optional[str],
+                  gallery_size: int) -> None:
+    # Warm-up: builds the model and detector and gives the reference embedding
+    _, reference = run_one(payloads[0], backend, None)
+    if reference is None:
+        print(f"[{backend}] no face found in the first image, results may be mostly failures")
+        reference = normalize_rows(np.ones(128, dtype=np.float32))[0]
+    with tempfile.TemporaryDirectory() as directory:
+        gallery = build_gallery(directory, reference, gallery_size)
+        try:
+            _bench(payloads, backend, concurrency, profile, gallery)
+        finally:
+            gallery.stop()
+
+
+def _bench(payloads: List[str], backend: str, concurrency: int, profile: Optional[str],
+           gallery: EmbeddingGallery) -> None:
+
+    wall_start = time.perf_counter()
+    if profile:
+        # cProfile only sees the thread it runs on, so profiling runs sequentially
+        profiler = cProfile.Profile()
+        profiler.enable()
+        results = [run_one(p, backend, gallery)[0] for p in payloads]
+        profiler.disable()
+        profiler.dump_stats(profile)
+        print(f"[{backend}] cProfile stats written to {profile}")
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = [r[0] for r in pool.map(lambda p: run_one(p, backend, gallery), payloads)]
+    wall = time.perf_counter() - wall_start
+
+    ok = [r for r in results if not np.isnan(r["total"])]
+    print(f"\n[{backend}] {len(payloads)} images, {len(ok)} embedded, "
+          f"concurrency {1 if profile else concurrency}, {len(ok) / wall if wall else 0:.2f} logins/s, "
+          f"gallery of {len(gallery)} users{' (IVF)' if len(gallery) >= gallery.ann_min_gallery else ''}")
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for stage in STAGES:
+        values = [r[stage] for r in results if not np.isnan(r[stage])]
+        mean = statistics.mean(values) if values else 0.0
+        print(f"{stage:<16}{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}{mean * 1000:>10.1f}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Face login per-stage latency benchmark")
+    parser.add_argument("images", help="Directory of face images (searched recursively)")
+    parser.add_argument("--backends", default="opencv", help="Comma separated detector backends, e.g. opencv,retinaface,mtcnn")
+    parser.add_argument("--concurrency", type=int, default=1, help="Worker threads replaying images")
+    parser.add_argument("--limit", type=int, help="Use at most this many images")
+    parser.add_argument("--profile", help="Write cProfile stats to this file (runs sequentially)")
+    parser.add_argument("--gallery-size", type=int, default=1000, help="Random users added to the scoring gallery")
+    args = parser.parse_args(argv)
+
+    payloads = load_payloads(args.images, args.limit)
+    if not payloads:
+        sys.exit(f"No images found in {args.images}")
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    for backend in backends:
+        profile = args.profile
+        if profile and len(backends) > 1:
+            profile = f"{os.path.splitext(profile)[0]}_{backend}.prof"
+        bench_backend(payloads, backend, max(1, args.concurrency), profile, max(0, args.gallery_size))
+
+
+if __name__ == "__main__":
+    main()
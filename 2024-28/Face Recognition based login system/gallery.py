@@ -0,0 +1,375 @@
+import os
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils import embedding_dir, user_storage_dir
+from gallery_file import PackedGalleryFile
+
+
+logger = logging.getLogger(__name__)
+
+GALLERY_POLL_INTERVAL: float = float(os.getenv("FACE_GALLERY_POLL_INTERVAL", "2.0"))
+# Galleries at least this large are searched through the approximate IVF index
+ANN_MIN_GALLERY: int = int(os.getenv("FACE_ANN_MIN_GALLERY", "10000"))
+IVF_NPROBE: int = int(os.getenv("FACE_IVF_NPROBE", "8"))
+# Share of users added or changed since the IVF lists were trained before they are retrained
+IVF_RETRAIN_FRACTION: float = float(os.getenv("FACE_IVF_RETRAIN_FRACTION", "0.2"))
+GALLERY_FILE: str = os.getenv("FACE_GALLERY_FILE") or os.path.join(user_storage_dir, "gallery.fgal")
+# Templates kept per user, and how much the centroid counts against the best single template
+MAX_TEMPLATES: int = int(os.getenv("FACE_MAX_TEMPLATES", "5"))
+CENTROID_WEIGHT: float = float(os.getenv("FACE_CENTROID_WEIGHT", "0.5"))
+# Users whose centroid is among this many IVF candidates get an exact score
+ANN_CANDIDATES: int = int(os.getenv("FACE_ANN_CANDIDATES", "10"))
+
+
+"""Approximate search"""
+
+class IVFIndex:
+    """Inverted-file index over L2-normalized rows.
+
+    Rows are clustered with spherical k-means into ``nlist`` lists; a query
+    only scores the rows in its ``nprobe`` closest lists. updated() reuses
+    the trained lists for a changed matrix, only assigning new rows to
+    their nearest list; ``stale`` counts those rows so the caller can
+    retrain once they drift too far from the training set.
+    """
+
+    def __init__(self, matrix: np.ndarray, nlist: Optional[int] = None, nprobe: int = IVF_NPROBE,
+                 iterations: int = 10, seed: int = 0):
+        self.nlist = max(1, min(len(matrix), nlist or int(np.sqrt(len(matrix)))))
+        self.nprobe = max(1, min(nprobe, self.nlist))
+        rng = np.random.default_rng(seed)
+        centroids = matrix[rng.choice(len(matrix), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(matrix @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, matrix)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-8), centroids).astype(np.float32)
+        self._set_lists(matrix, centroids, np.argmax(matrix @ centroids.T, axis=1))
+        self.stale = 0
+
+    def _set_lists(self, matrix: np.ndarray, centroids: np.ndarray, assign: np.ndarray) -> None:
+        order = np.argsort(assign, kind="stable")
+        self.matrix = matrix
+        self.centroids = centroids
+        self.assign = assign
+        self.rows = order
+        self.offsets = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+
+    def updated(self, matrix: np.ndarray, reuse: np.ndarray) -> "IVFIndex":
+        """Index over ``matrix`` with the same lists; ``reuse[i]`` is row i's row here, or -1 if new."""
+        known = reuse >= 0
+        assign = np.empty(len(matrix), dtype=np.int64)
+        assign[known] = self.assign[reuse[known]]
+        if not known.all():
+            assign[~known] = np.argmax(matrix[~known] @ self.centroids.T, axis=1)
+        index = object.__new__(IVFIndex)
+        index.nlist, index.nprobe = self.nlist, self.nprobe
+        index._set_lists(matrix, self.centroids, assign)
+        index.stale = self.stale + int((~known).sum())
+        return index
+
+    def search(self, probe: np.ndarray, k: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row ids, scores) of the top ``k`` candidates, best first."""
+        lists = np.argpartition(-(self.centroids @ probe), self.nprobe - 1)[:self.nprobe]
+        candidates = np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+        return top_k(candidates, self.matrix[candidates] @ probe, k)
+
+
+def top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(scores))
+    if k == 0:
+        return rows[:0], scores[:0]
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return rows[best], scores[best]
+
+
+"""Resident embedding gallery"""
+
+def normalize_rows(m: np.ndarray) -> np.ndarray:
+    m = np.atleast_2d(np.asarray(m, dtype=np.float32))
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-8)
+
+
+def _block_rows(blocks) -> Tuple[np.ndarray, np.ndarray]:
+    """Template rows of the blocks, grouped per block, and where each group starts."""
+    if not blocks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    counts = np.array([c for _, c in blocks], dtype=np.int64)
+    rows = np.concatenate([np.arange(s, s + c) for s, c in blocks])
+    return rows, np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+
+class _Snapshot:
+    """Immutable view of the loaded gallery, swapped atomically on reload.
+
+    Built from the ``previous`` snapshot where possible: users whose block
+    is unchanged keep their centroid and IVF list, so a reload after one
+    enrollment only computes the new user's centroid. The IVF lists are
+    retrained once more than ``IVF_RETRAIN_FRACTION`` of the users were
+    assigned incrementally (a compaction moves every block, so it retrains).
+    """
+
+    def __init__(self, matrix: np.ndarray, table: Dict[str, Tuple[int, int]], ann_min_gallery: int,
+                 previous: Optional["_Snapshot"] = None):
+        self.matrix = matrix
+        self.usernames: Tuple[str, ...] = tuple(sorted(table))
+        self.index: Dict[str, int] = {u: i for i, u in enumerate(self.usernames)}
+        self.blocks = [table[u] for u in self.usernames]
+        # Live template rows grouped per user, and where each user's group starts
+        self.live_rows, self.starts = _block_rows(self.blocks)
+
+        dim = matrix.shape[1] if matrix.ndim == 2 else 0
+        reuse = np.full(len(self.usernames), -1, dtype=np.int64)
+        if previous is not None and previous.centroids.shape[1] == dim:
+            for i, (username, block) in enumerate(zip(self.usernames, self.blocks)):
+                j = previous.index.get(username)
+                if j is not None and previous.blocks[j] == block:
+                    reuse[i] = j
+        known = reuse >= 0
+        self.centroids = np.zeros((len(self.usernames), dim), dtype=np.float32)
+        if known.any():
+            self.centroids[known] = previous.centroids[reuse[known]]
+        changed = np.flatnonzero(~known)
+        if len(changed):
+            rows, starts = _block_rows([self.blocks[i] for i in changed])
+            self.centroids[changed] = normalize_rows(np.add.reduceat(np.asarray(matrix[rows]), starts, axis=0))
+
+        self.ann: Optional[IVFIndex] = None
+        if len(self.usernames) >= ann_min_gallery:
+            old = previous.ann if previous is not None else None
+            if old is not None and old.stale + len(changed) <= IVF_RETRAIN_FRACTION * len(self.usernames):
+                self.ann = old.updated(self.centroids, reuse)
+            else:
+                self.ann = IVFIndex(self.centroids)
+
+
+class EmbeddingGallery:
+    """All enrolled face templates, memory-mapped from one packed gallery file.
+
+    Each user has up to ``max_templates`` L2-normalized templates stored as
+    contiguous rows (see gallery_file.py). A user's score for a probe blends
+    the similarity to their template centroid with their best single
+    template, which tolerates one bad enrollment shot without needing
+    retries. Scoring every user is one matrix-vector product plus a
+    per-user max, so logins never touch the filesystem.
+
+    Nothing is read until start() (or the first lookup), so importing this
+    module in inference worker processes costs nothing. A background thread
+    then polls the gallery file (mtime/size) and reloads it when it changes.
+    Legacy ``<username>.npy`` files in the embeddings directory are imported
+    as single templates once, at start().
+    """
+
+    def __init__(self, path: str, legacy_dir: Optional[str] = None, poll_interval: float = GALLERY_POLL_INTERVAL,
+                 ann_min_gallery: int = ANN_MIN_GALLERY, max_templates: int = MAX_TEMPLATES,
+                 centroid_weight: float = CENTROID_WEIGHT):
+        self.file = PackedGalleryFile(path)
+        self.legacy_dir = legacy_dir
+        self.poll_interval = poll_interval
+        self.ann_min_gallery = ann_min_gallery
+        self.max_templates = max_templates
+        self.centroid_weight = centroid_weight
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._snap = _Snapshot(np.zeros((0, 0), dtype=np.float32), {}, ann_min_gallery)
+
+    def __len__(self) -> int:
+        return len(self._snapshot().usernames)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._snapshot().index
+
+    @property
+    def usernames(self) -> Tuple[str, ...]:
+        return self._snapshot().usernames
+
+    def _snapshot(self) -> _Snapshot:
+        if self._thread is None:
+            self.start()
+        return self._snap
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.file.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _import_legacy(self) -> bool:
+        """Add ``<username>.npy`` files for users the gallery file doesn't know yet."""
+        if not self.legacy_dir:
+            return False
+        try:
+            with os.scandir(self.legacy_dir) as entries:
+                names = [e.name for e in entries if e.name.endswith(".npy") and e.is_file()]
+        except FileNotFoundError:
+            return False
+        known = self._snap.index
+        imported = False
+        for name in names:
+            username = name[:-len(".npy")]
+            if username in known:
+                continue
+            try:
+                vec = np.load(os.path.join(self.legacy_dir, name)).astype(np.float32).ravel()
+            except Exception as e:
+                logger.warning("Skipping unreadable embedding %s: %s", name, e)
+                continue
+            n = float(np.linalg.norm(vec))
+            if not np.isfinite(n) or n == 0.0:
+                logger.warning("Skipping empty embedding %s", name)
+                continue
+            # Another process may have imported it since our last reload
+            with self._write_lock:
+                imported = self.file.put(username, (vec / n)[None, :], only_if_missing=True) or imported
+        return imported
+
+    def _reload(self) -> bool:
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        matrix, table = self.file.read()
+        snap = _Snapshot(matrix, table, self.ann_min_gallery, previous=self._snap)
+        with self._lock:
+            self._snap = snap
+            self._stamp = stamp
+        logger.info("Embedding gallery loaded %d users", len(snap.usernames))
+        return True
+
+    def refresh(self) -> bool:
+        """Reload the gallery file if it changed. Returns True if the gallery changed."""
+        return self._reload()
+
+    def enroll(self, username: str, embeddings: np.ndarray, replace: bool = False) -> int:
+        """Add templates for a user (or replace them) and return how many they now have.
+
+        Only the newest ``max_templates`` are kept. The file is compacted once
+        dead rows outnumber live ones.
+        """
+        new = normalize_rows(embeddings)
+        self._snapshot()
+        with self._write_lock:
+            snap = self._snap
+            row = snap.index.get(username)
+            if row is not None and not replace:
+                start, count = snap.blocks[row]
+                new = np.concatenate([np.asarray(snap.matrix[start:start + count]), new])
+            new = new[-self.max_templates:]
+            self.file.put(username, new)
+            if self.file.dead_rows() > len(snap.live_rows) + len(new):
+                self.file.compact()
+        self.refresh()
+        return len(new)
+
+    def remove(self, username: str) -> None:
+        self._snapshot()
+        with self._write_lock:
+            self.file.delete(username)
+            # Otherwise the legacy import would bring the user straight back
+            if self.legacy_dir:
+                try:
+                    os.remove(os.path.join(self.legacy_dir, f"{username}.npy"))
+                except FileNotFoundError:
+                    pass
+        self.refresh()
+
+    def _aggregate(self, template_scores: np.ndarray, centroid_scores: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        best = np.maximum.reduceat(template_scores, starts)
+        return self.centroid_weight * centroid_scores + (1.0 - self.centroid_weight) * best
+
+    def verify(self, username: str, probe: np.ndarray) -> Optional[float]:
+        """Score a probe against one user's templates, or None if not enrolled."""
+        snap = self._snapshot()
+        row = snap.index.get(username)
+        if row is None:
+            return None
+        probe = normalize_rows(probe)[0]
+        start, count = snap.blocks[row]
+        template_scores = np.asarray(snap.matrix[start:start + count]) @ probe
+        return float(self._aggregate(template_scores, snap.centroids[row:row + 1] @ probe, np.zeros(1, dtype=np.int64))[0])
+
+    def scores(self, probe: np.ndarray) -> Tuple[Tuple[str, ...], np.ndarray]:
+        """Aggregated similarity of a probe against every enrolled user."""
+        snap = self._snapshot()
+        if not snap.usernames:
+            return snap.usernames, np.zeros(0, dtype=np.float32)
+        probe = normalize_rows(probe)[0]
+        template_scores = (snap.matrix @ probe)[snap.live_rows]
+        return snap.usernames, self._aggregate(template_scores, snap.centroids @ probe, snap.starts)
+
+    def _candidate_scores(self, snap: _Snapshot, probe: np.ndarray, users: np.ndarray) -> np.ndarray:
+        blocks = [snap.blocks[u] for u in users]
+        rows = np.concatenate([np.arange(s, s + c) for s, c in blocks])
+        starts = np.concatenate([[0], np.cumsum([c for _, c in blocks])[:-1]]).astype(np.int64)
+        template_scores = np.asarray(snap.matrix[rows]) @ probe
+        return self._aggregate(template_scores, snap.centroids[users] @ probe, starts)
+
+    def identify(self, probe: np.ndarray) -> Optional[Dict[str, object]]:
+        """Find the closest enrolled user for a probe embedding (1:N).
+
+        Small galleries are scored exactly, larger ones first shortlist users
+        through the IVF index over template centroids. Returns the best match,
+        its score and the margin to the runner-up, or None if nobody is enrolled.
+        """
+        snap = self._snapshot()
+        if not snap.usernames:
+            return None
+        probe = normalize_rows(probe)[0]
+
+        candidates = snap.ann.search(probe, k=ANN_CANDIDATES)[0] if snap.ann is not None else None
+        if candidates is not None and len(candidates):
+            users, scores = top_k(candidates, self._candidate_scores(snap, probe, candidates), 2)
+        else:
+            # Exact search, also when the probed lists happen to be empty
+            template_scores = (snap.matrix @ probe)[snap.live_rows]
+            all_scores = self._aggregate(template_scores, snap.centroids @ probe, snap.starts)
+            users, scores = top_k(np.arange(len(snap.usernames)), all_scores, 2)
+
+        best_score = float(scores[0])
+        runner_up = snap.usernames[users[1]] if len(users) > 1 else None
+        runner_up_score = float(scores[1]) if len(users) > 1 else None
+        return {
+            'username': snap.usernames[users[0]],
+            'score': best_score,
+            'runner_up': runner_up,
+            'runner_up_score': runner_up_score,
+            'margin': best_score - runner_up_score if runner_up_score is not None else None,
+            'approximate': snap.ann is not None,
+        }
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Embedding gallery refresh failed: %s", e)
+
+    def start(self) -> None:
+        """Load the gallery and start hot-reloading in a background thread."""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self.refresh()
+            if self._import_legacy():
+                self.refresh()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="embedding-gallery", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# Started by app.py in the serving process
+gallery = EmbeddingGallery(GALLERY_FILE, legacy_dir=embedding_dir)
@@ -0,0 +1,210 @@
+import os
+import json
+import fcntl
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+"""Packed gallery file
+
+Layout (little endian):
+
+    header   64 bytes   magic b"FGAL", version u32, dim u32, rows u64,
+                        table_offset u64, table_length u64, padding
+    matrix   rows x dim float32, one L2-normalized template per row
+    table    JSON {username: [first_row, count]}
+
+A user's templates are always contiguous rows. Re-enrolling a user writes
+their new block after the last row and points the table at it; the old
+rows become dead until compact() rewrites the file with live rows only.
+The matrix region can be opened with np.memmap straight from the file.
+
+Appends never overwrite bytes the header points to: the current table is
+first copied past the end of the file and the header moved to it, then the
+new rows and table are written and the header is switched over last. A
+crash at any step leaves the header pointing at a complete table.
+
+POSIX only: delete() and compact() os.replace() the file while readers
+still have the old one memory-mapped (they keep the old inode until they
+reload), which Windows refuses, and locking uses fcntl.flock.
+"""
+
+MAGIC = b"FGAL"
+VERSION = 1
+HEADER = struct.Struct("<4sIIQQQ")
+HEADER_SIZE = 64
+
+
+class PackedGalleryFile:
+    """Reader/writer for the packed multi-template gallery file.
+
+    Access is serialized by a lock within the process and an flock on
+    ``<path>.lock`` across processes: shared for readers, exclusive for
+    writers.
+    """
+
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".lock", 'a+b') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_header(self, f) -> Tuple[int, int, int, int]:
+        raw = f.read(HEADER.size)
+        magic, version, dim, rows, table_offset, table_length = HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a gallery file")
+        return dim, rows, table_offset, table_length
+
+    def read(self) -> Tuple[np.ndarray, Dict[str, Tuple[int, int]]]:
+        """Return (memory-mapped template matrix, {username: (first_row, count)})."""
+        if not os.path.exists(self.path):
+            return np.zeros((0, self.dim or 0), dtype=np.float32), {}
+        with self._locked(exclusive=False):
+            return self._read()
+
+    def _read(self) -> Tuple[np.ndarray, Dict[str, Tuple[int, int]]]:
+        if not os.path.exists(self.path):
+            return np.zeros((0, self.dim or 0), dtype=np.float32), {}
+        with open(self.path, 'rb') as f:
+            dim, rows, table_offset, table_length = self._read_header(f)
+            f.seek(table_offset)
+            table = {u: (int(r[0]), int(r[1])) for u, r in json.loads(f.read(table_length) or b"{}").items()}
+        self.dim = dim
+        if rows == 0:
+            return np.zeros((0, dim), dtype=np.float32), table
+        matrix = np.memmap(self.path, dtype=np.float32, mode='r', offset=HEADER_SIZE, shape=(rows, dim))
+        return matrix, table
+
+    def _write_header(self, f, dim: int, rows: int, table_offset: int, table_length: int) -> None:
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, dim, rows, table_offset, table_length).ljust(HEADER_SIZE, b"\0"))
+
+    def _write_new(self, path: str, matrix: np.ndarray, table: Dict[str, Tuple[int, int]]) -> None:
+        dim = matrix.shape[1] if matrix.size else (self.dim or 0)
+        payload = json.dumps(table).encode()
+        with open(path, 'wb') as f:
+            table_offset = HEADER_SIZE + matrix.shape[0] * dim * 4
+            self._write_header(f, dim, matrix.shape[0], table_offset, len(payload))
+            f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replace(self, matrix: np.ndarray, table: Dict[str, Tuple[int, int]]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".gallery-", suffix=".tmp", dir=directory)
+        os.close(fd)
+        try:
+            self._write_new(tmp_path, matrix, table)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def write(self, matrix: np.ndarray, table: Dict[str, Tuple[int, int]]) -> None:
+        """Replace the whole file with ``matrix`` and its ``table`` (bulk loads)."""
+        matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+        with self._locked(exclusive=True):
+            self.dim = matrix.shape[1]
+            self._replace(matrix, table)
+
+    def put(self, username: str, templates: np.ndarray, only_if_missing: bool = False) -> bool:
+        """Store ``templates`` (K x dim) as the user's full template set.
+
+        With ``only_if_missing`` nothing is written if the user already has
+        templates. Returns True if the file was changed.
+        """
+        templates = np.atleast_2d(np.asarray(templates, dtype=np.float32))
+        with self._locked(exclusive=True):
+            if not os.path.exists(self.path):
+                self.dim = templates.shape[1]
+                self._replace(templates, {username: (0, len(templates))})
+                return True
+            with open(self.path, 'r+b') as f:
+                dim, rows, table_offset, table_length = self._read_header(f)
+                if templates.shape[1] != dim:
+                    raise ValueError(f"Template dimension {templates.shape[1]} does not match gallery ({dim})")
+                f.seek(table_offset)
+                old_payload = f.read(table_length)
+                table = json.loads(old_payload or b"{}")
+                if only_if_missing and username in table:
+                    return False
+                table[username] = [rows, len(templates)]
+                payload = json.dumps(table).encode()
+                row_offset = HEADER_SIZE + rows * dim * 4
+                new_rows = rows + len(templates)
+                new_offset = HEADER_SIZE + new_rows * dim * 4
+                end = new_offset + len(payload)
+
+                # 1. Move the current table out of the way of the new rows
+                if table_offset < end and table_offset + table_length > row_offset:
+                    spare_offset = max(end, table_offset + table_length)
+                    f.seek(spare_offset)
+                    f.write(old_payload)
+                    self._sync(f)
+                    self._write_header(f, dim, rows, spare_offset, table_length)
+                    self._sync(f)
+                # 2. New rows after the last row, followed by the new table
+                f.seek(row_offset)
+                f.write(templates.tobytes())
+                f.write(payload)
+                self._sync(f)
+                # 3. Switch the header over, then drop the spare copy
+                self._write_header(f, dim, new_rows, new_offset, len(payload))
+                self._sync(f)
+                f.truncate(end)
+        return True
+
+    @staticmethod
+    def _sync(f) -> None:
+        f.flush()
+        os.fsync(f.fileno())
+
+    def delete(self, username: str) -> None:
+        with self._locked(exclusive=True):
+            matrix, table = self._read()
+            if username in table:
+                del table[username]
+                self._replace(np.asarray(matrix), table)
+
+    def dead_rows(self) -> int:
+        matrix, table = self.read()
+        return matrix.shape[0] - sum(count for _, count in table.values())
+
+    def compact(self) -> None:
+        """Rewrite the file with live rows only, users in sorted order."""
+        with self._locked(exclusive=True):
+            matrix, table = self._read()
+            blocks: List[np.ndarray] = []
+            new_table: Dict[str, Tuple[int, int]] = {}
+            row = 0
+            for username in sorted(table):
+                start, count = table[username]
+                blocks.append(np.asarray(matrix[start:start + count]))
+                new_table[username] = (row, count)
+                row += count
+            dim = matrix.shape[1] if matrix.ndim == 2 else (self.dim or 0)
+            packed = np.concatenate(blocks) if blocks else np.zeros((0, dim), dtype=np.float32)
+            del matrix
+            self._replace(packed, new_table)
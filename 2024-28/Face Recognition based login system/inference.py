@@ -0,0 +1,252 @@
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils import get_embeddings_batch, model_name, detector_backend
+
+
+logger = logging.getLogger(__name__)
+
+# 0 runs inference in the web process itself, >0 uses that many worker processes
+INFERENCE_WORKERS: int = int(os.getenv("FACE_INFERENCE_WORKERS", "1"))
+INFERENCE_TIMEOUT: float = float(os.getenv("FACE_INFERENCE_TIMEOUT", "10"))
+# Micro-batching: a batch is sent when it is full or the first request has waited this long
+BATCH_MAX_SIZE: int = int(os.getenv("FACE_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS: float = float(os.getenv("FACE_BATCH_MAX_WAIT_MS", "10"))
+
+
+"""Model warm-up"""
+
+def warm_up() -> None:
+    """Load Facenet and the detector and run one throwaway inference.
+
+    The first DeepFace call builds the model graph and detector; doing it
+    here keeps that cost out of the first real login.
+    """
+    from deepface import DeepFace  # type: ignore
+
+    DeepFace.build_model(model_name)
+    dummy = np.zeros((160, 160, 3), dtype=np.uint8)
+    try:
+        DeepFace.represent(img_path=dummy, model_name=model_name, detector_backend=detector_backend,
+                           enforce_detection=False)
+    except Exception as e:
+        logger.warning("Warm-up inference failed: %s", e)
+
+
+def _ready() -> bool:
+    return True
+
+
+"""Inference engine"""
+
+class InferenceEngine:
+    """Runs face embedding on warmed-up, dedicated workers with micro-batching.
+
+    With ``workers > 0`` each worker is a separate process that loads the
+    model once, so concurrent logins don't contend on the GIL or share one
+    TensorFlow session with the request threads.
+
+    Requests are queued and a batcher thread groups those arriving within
+    ``max_wait_ms`` (up to ``max_batch`` images) into one batched Facenet
+    forward pass, then hands each caller its own result. At most one batch
+    per worker is in flight; while all workers are busy the batcher keeps
+    adding queued requests to the pending batch, so under load batches fill
+    up instead of queueing behind each other. Every call has a timeout; a
+    request that misses it gets ``None`` like any failed embedding.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, timeout: float = INFERENCE_TIMEOUT,
+                 max_batch: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Future]]]" = queue.Queue()
+        self._batcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # One slot per worker; a batch is only submitted when a worker is free
+        self._slots = threading.Semaphore(max(1, workers))
+        self._stats_lock = threading.Lock()
+        self.batch_sizes: Counter = Counter()
+
+    def start(self) -> None:
+        """Preload the model (in every worker) and start the batcher."""
+        with self._lock:
+            self._start()
+
+    def _start(self) -> None:
+        if self._batcher is not None:
+            return
+        if self.workers <= 0:
+            warm_up()
+        else:
+            # spawn: forking a process that already imported TensorFlow is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up,
+            )
+            # One task per worker so all of them are started and warmed now
+            for future in [self._pool.submit(_ready) for _ in range(self.workers)]:
+                future.result()
+            logger.info("Started %d warmed-up inference worker(s)", self.workers)
+        self._batcher = threading.Thread(target=self._run_batcher, name="embedding-batcher", daemon=True)
+        self._batcher.start()
+
+    def embed(self, image: np.ndarray, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Return the normalized embedding for a decoded image, or None."""
+        if self._batcher is None:
+            self.start()
+        timeout = timeout or self.timeout
+        future: Future = Future()
+        self._queue.put((image, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            logger.warning("Embedding request timed out after %.1fs", timeout)
+            return None
+        except Exception as e:
+            logger.error("Embedding worker failed: %s", e)
+            return None
+
+    def embed_many(self, images: List[np.ndarray], timeout: Optional[float] = None) -> List[Optional[np.ndarray]]:
+        """Embed several images at once; they are queued together so they share batches."""
+        if self._batcher is None:
+            self.start()
+        timeout = timeout or self.timeout
+        futures: List[Future] = []
+        for image in images:
+            future: Future = Future()
+            self._queue.put((image, future))
+            futures.append(future)
+        deadline = time.monotonic() + timeout
+        results: List[Optional[np.ndarray]] = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                future.cancel()
+                results.append(None)
+            except Exception as e:
+                logger.error("Embedding worker failed: %s", e)
+                results.append(None)
+        return results
+
+    def _collect(self) -> Optional[List[Tuple[np.ndarray, Future]]]:
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _wait_for_worker(self, batch: List[Tuple[np.ndarray, Future]]) -> List[Tuple[np.ndarray, Future]]:
+        """Take a worker slot, merging requests into ``batch`` while none is free."""
+        while not self._slots.acquire(blocking=False):
+            if len(batch) >= self.max_batch:
+                self._slots.acquire()
+                break
+            try:
+                item = self._queue.get(timeout=max(self.max_wait, 0.001))
+            except queue.Empty:
+                continue
+            if item is None:
+                self._queue.put(None)
+                self._slots.acquire()
+                break
+            batch.append(item)
+        return batch
+
+    def _run_batcher(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            if self._pool is not None:
+                batch = self._wait_for_worker(batch)
+            # Skip callers that already timed out
+            batch = [(img, fut) for img, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                if self._pool is not None:
+                    self._slots.release()
+                continue
+            with self._stats_lock:
+                self.batch_sizes[len(batch)] += 1
+
+            images = [img for img, _ in batch]
+            waiters = [fut for _, fut in batch]
+            if self._pool is None:
+                try:
+                    _scatter(waiters, get_embeddings_batch(images), None)
+                except Exception as e:
+                    _scatter(waiters, None, e)
+            else:
+                try:
+                    result = self._pool.submit(get_embeddings_batch, images)
+                except Exception as e:
+                    self._slots.release()
+                    _scatter(waiters, None, e)
+                    continue
+                result.add_done_callback(lambda f, waiters=waiters: self._finish(f, waiters))
+
+    def _finish(self, result: Future, waiters: List[Future]) -> None:
+        self._slots.release()
+        error = CancelledError() if result.cancelled() else result.exception()
+        _scatter(waiters, None if error else result.result(), error)
+
+    def stats(self) -> Dict[str, object]:
+        """Batch-size histogram and queue depth."""
+        with self._stats_lock:
+            histogram = dict(sorted(self.batch_sizes.items()))
+        batches = sum(histogram.values())
+        requests = sum(size * count for size, count in histogram.items())
+        return {
+            'batch_size_histogram': histogram,
+            'batches': batches,
+            'requests': requests,
+            'mean_batch_size': requests / batches if batches else 0.0,
+            'queued': self._queue.qsize(),
+        }
+
+    def shutdown(self) -> None:
+        if self._batcher is not None:
+            self._queue.put(None)
+            self._batcher.join(timeout=self.timeout)
+            self._batcher = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+def _scatter(waiters: List[Future], results: Optional[list], error: Optional[BaseException]) -> None:
+    for i, waiter in enumerate(waiters):
+        if error is not None:
+            waiter.set_exception(error)
+        else:
+            waiter.set_result(results[i])
+
+
+engine = InferenceEngine()
@@ -141,11 +141,25 @@ const streamManager = (() => {
         return dataUrl.slice(separator + 1);
     }
 
+    // Same frame as capture(), but as a JPEG Blob for binary uploads
+    function captureBlob(video, canvas) {
+        capture(video, canvas);
+        return new Promise((resolve, reject) => {
+            canvas.toBlob((blob) => {
+                if (blob) {
+                    resolve(blob);
+                } else {
+                    reject(new Error('Failed to capture frame.'));
+                }
+            }, 'image/jpeg', 0.92);
+        });
+    }
+
     function isActive() {
         return Boolean(stream);
     }
 
-    return { start, stop, capture, attach, isActive };
+    return { start, stop, capture, captureBlob, attach, isActive };
 })();
 
 async function submitJSON(url, payload) {
@@ -167,6 +181,22 @@ async function submitJSON(url, payload) {
     return { ok: response.ok, status: response.status, data };
 }
 
+async function submitForm(url, formData) {
+    const response = await fetch(url, {
+        method: 'POST',
+        body: formData
+    });
+
+    let data;
+    try {
+        data = await response.json();
+    } catch (error) {
+        data = { message: 'Unexpected server response.' };
+    }
+
+    return { ok: response.ok, status: response.status, data };
+}
+
 function setupNavigation() {
     const navToggle = document.querySelector('.nav-toggle');
     const navLinks = document.querySelector('.nav-links');
@@ -507,7 +537,7 @@ function initLoginPage() {
 
         let snapshot;
         try {
-            snapshot = streamManager.capture(video, canvas);
+            snapshot = await streamManager.captureBlob(video, canvas);
         } catch (error) {
             const message = error instanceof Error ? error.message : 'Unable to capture frame. Adjust positioning and retry.';
             toggleModal({
@@ -526,13 +556,12 @@ function initLoginPage() {
         loginButton.textContent = 'Authenticating...';
 
         try {
-            const payload = {
-                username,
-                usernmae: username,
-                face_image: snapshot,
-                attempt
-            };
-            const { ok, status, data } = await submitJSON(apiRoutes.loginFace, payload);
+            // Send the JPEG as binary multipart instead of base64 inside JSON
+            const payload = new FormData();
+            payload.append('username', username);
+            payload.append('attempt', String(attempt));
+            payload.append('face_image', snapshot, 'face.jpg');
+            const { ok, status, data } = await submitForm(apiRoutes.loginFace, payload);
             if (ok) {
                 setChip(attemptChip, 'Authenticated successfully', 'success');
                 setChip(statusBadge, 'Access granted', 'success');
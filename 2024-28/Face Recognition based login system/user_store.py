@@ -0,0 +1,162 @@
+import os
+import json
+import fcntl
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+
+"""JSON file store"""
+
+class JsonUserStore:
+    """Users kept in a JSON file, parsed once and served from memory.
+
+    Every read revalidates with a single ``os.stat`` (mtime/size) and only
+    re-parses the file when another process has changed it. Writes go to a
+    temp file in the same directory that is then renamed over the original,
+    so readers never see a half-written file. Writers hold an flock on
+    ``<path>.lock`` around the read-modify-write, so concurrent writes from
+    several worker processes don't lose each other's updates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._users: Dict[str, dict] = {}
+
+    @contextmanager
+    def _write_locked(self) -> Iterator[None]:
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + ".lock", 'a+b') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _current(self) -> Dict[str, dict]:
+        """Return the cached users, re-reading the file if it changed. Caller holds the lock."""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return self._users
+        users = {}
+        if stamp is not None and stamp[1] > 0:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    users = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                users = {}
+        self._users = users if isinstance(users, dict) else {}
+        self._stamp = stamp
+        return self._users
+
+    def _write(self, users: Dict[str, dict]) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".users-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(users, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._users = users
+        self._stamp = self._stat()
+
+    def load(self) -> Dict[str, dict]:
+        with self._lock:
+            return dict(self._current())
+
+    def save(self, users: Dict[str, dict]) -> None:
+        with self._write_locked():
+            self._write(dict(users))
+
+    def get(self, username: str) -> Optional[dict]:
+        with self._lock:
+            return self._current().get(username)
+
+    def set(self, username: str, record: dict) -> None:
+        with self._write_locked():
+            # Re-read under the file lock; the mtime/size stamp can miss a write in the same tick
+            self._stamp = None
+            users = dict(self._current())
+            users[username] = record
+            self._write(users)
+
+    def __contains__(self, username: str) -> bool:
+        return self.get(username) is not None
+
+
+"""SQLite store"""
+
+class SqliteUserStore:
+    """Users kept in a SQLite table, one row per user.
+
+    Lookups are a primary-key query instead of parsing every user, which
+    keeps credential login flat for large user counts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self) -> Dict[str, dict]:
+        rows = self._conn().execute("SELECT username, data FROM users").fetchall()
+        return {username: json.loads(data) for username, data in rows}
+
+    def save(self, users: Dict[str, dict]) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany("INSERT INTO users (username, data) VALUES (?, ?)",
+                             [(u, json.dumps(r)) for u, r in users.items()])
+
+    def get(self, username: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, username: str, record: dict) -> None:
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO users (username, data) VALUES (?, ?)", (username, json.dumps(record)))
+
+    def __contains__(self, username: str) -> bool:
+        return self.get(username) is not None
+
+
+def create_user_store(user_file: str):
+    """Pick the backend from USER_STORE (``json`` by default, or ``sqlite``)."""
+    if os.getenv("USER_STORE", "json").lower() == "sqlite":
+        db_path = os.getenv("USER_DB") or os.path.splitext(user_file)[0] + ".db"
+        store = SqliteUserStore(db_path)
+        # First run on SQLite: carry over anyone already in users.json
+        if os.path.exists(user_file) and not store.load():
+            store.save(JsonUserStore(user_file).load())
+        return store
+    return JsonUserStore(user_file)
@@ -5,7 +5,7 @@ import cv2
 import os
 from numpy.linalg import norm
 from dotenv import load_dotenv
-import json
+from user_store import create_user_store
 
 load_dotenv()
 
@@ -21,58 +21,129 @@ user_file=os.getenv("USER_FILE") or os.path.join(user_storage_dir,"users.json")
 embedding_dir=os.getenv("EMBEDDINGS_DIR") or os.getenv("EMBEDDING_DIR") or os.path.join(user_storage_dir,"embeddings")
 os.makedirs(embedding_dir,exist_ok=True)
 jwt_secret_key=os.getenv("JWT_SECRET_KEY")
+# 1:N identification: minimum cosine similarity and lead over the runner-up
+identify_threshold=float(os.getenv("FACE_IDENTIFY_THRESHOLD","0.75"))
+identify_min_margin=float(os.getenv("FACE_IDENTIFY_MIN_MARGIN","0.05"))
+# 1:1 verification: minimum aggregated similarity to the user's templates
+match_threshold=float(os.getenv("FACE_MATCH_THRESHOLD","0.75"))
+# Face model and detector used for every embedding
+model_name="Facenet"
+detector_backend=os.getenv("FACE_DETECTOR_BACKEND","opencv")
+# Snapshots are downscaled to this longest side before detection
+max_image_dim=int(os.getenv("FACE_MAX_IMAGE_DIM","640"))
 
 
 """User managemetn"""
 
-def load_users():
-    # if os.path.exists(user_file): #type: ignore 
-    #     with open(user_file,'r') as f: #type: ignore
-    #         return json.loads(f) 
-
-    if not user_file:
-        return {}
-
-    if not os.path.exists(user_file):
-        return {}
-
-    with open(user_file,'r',encoding='utf-8') as f: #type: ignore
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-    
-    return {}
-
-def save_users(users):
-    # with open(user_file,'w') as f: #type: ignore
-    #     json.dump(users,f,indent=4)
-    if not user_file:
-        return
-
-    os.makedirs(os.path.dirname(user_file),exist_ok=True)
-    with open(user_file,'w',encoding='utf-8') as f: #type: ignore
-        json.dump(users,f,indent=4)
+# Parsed once and revalidated with os.stat, see user_store.py
+user_store=create_user_store(user_file)
         
             
     
 """Image Embedding generation"""
 
 
-def decode_base64_image(image):
-    data=base64.b64decode(image)
-    arr=np.frombuffer(data,np.uint8)
-    return cv2.imdecode(arr,cv2.IMREAD_COLOR) 
+def image_size(data):
+    """Read (width, height) from a JPEG or PNG header without decoding, or None."""
+    if data[:8]==b"\x89PNG\r\n\x1a\n" and len(data)>=24:
+        return int.from_bytes(data[16:20],"big"),int.from_bytes(data[20:24],"big")
+    if data[:2]!=b"\xff\xd8":
+        return None
+    i=2
+    while i+9<len(data):
+        if data[i]!=0xFF:
+            return None
+        marker=data[i+1]
+        if marker in (0xD8,0x01) or 0xD0<=marker<=0xD7:
+            i+=2
+            continue
+        length=int.from_bytes(data[i+2:i+4],"big")
+        # SOF0..SOF15, except DHT/JPG/DAC which share the range
+        if 0xC0<=marker<=0xCF and marker not in (0xC4,0xC8,0xCC):
+            return int.from_bytes(data[i+7:i+9],"big"),int.from_bytes(data[i+5:i+7],"big")
+        i+=2+length
+    return None
 
-def get_embeddings(image):
+def limit_image_size(img,max_dim=None):
+    """Downscale so the longest side is at most max_dim (FACE_MAX_IMAGE_DIM)."""
+    max_dim=max_dim or max_image_dim
+    h,w=img.shape[:2]
+    if max(h,w)<=max_dim:
+        return img
+    scale=max_dim/max(h,w)
+    return cv2.resize(img,(max(1,int(w*scale)),max(1,int(h*scale))),interpolation=cv2.INTER_AREA)
+
+def decode_image_bytes(data):
+    """Decode JPEG/PNG bytes, letting libjpeg downscale by 2/4/8 when the image is far larger than needed."""
     try:
-        out=DeepFace.represent(img_path=image,model_name="Facenet",enforce_detection=True)
-        emb=np.array(out[0]['embedding'],dtype=np.float32)
-        emb /=norm(emb)
-        return emb
-    except Exception as e:
-        print(e)
+        flag=cv2.IMREAD_COLOR
+        size=image_size(bytes(data[:65536]))
+        if size:
+            longest=max(size)
+            for factor,reduced in ((8,cv2.IMREAD_REDUCED_COLOR_8),(4,cv2.IMREAD_REDUCED_COLOR_4),(2,cv2.IMREAD_REDUCED_COLOR_2)):
+                if longest//factor>=max_image_dim:
+                    flag=reduced
+                    break
+        img=cv2.imdecode(np.frombuffer(data,np.uint8),flag)
+        if img is None:
+            return None
+        return limit_image_size(img)
+    except Exception:
         return None
+
+def decode_base64_image(image):
+    # Accept data URLs like "data:image/jpeg;base64,..."
+    try:
+        data=base64.b64decode(image.split(',')[-1])
+    except Exception:
+        return None
+    return decode_image_bytes(data)
+
+def preprocess_face(face,target_size):
+    """Resize an aligned face the way DeepFace.represent does (keep aspect, zero pad), RGB -> BGR, [0,1]."""
+    face=np.ascontiguousarray(face[:,:,::-1])
+    factor=min(target_size[0]/face.shape[0],target_size[1]/face.shape[1])
+    face=cv2.resize(face,(int(face.shape[1]*factor),int(face.shape[0]*factor)))
+    diff_0=target_size[0]-face.shape[0]
+    diff_1=target_size[1]-face.shape[1]
+    face=np.pad(face,((diff_0//2,diff_0-diff_0//2),(diff_1//2,diff_1-diff_1//2),(0,0)),"constant")
+    if face.shape[0:2]!=tuple(target_size):
+        face=cv2.resize(face,(target_size[1],target_size[0]))
+    face=face.astype(np.float32)
+    if face.max()>1:
+        face/=255.0
+    return face
+
+def get_embeddings_batch(images):
+    """Embed several images with one Facenet forward pass.
+
+    Each image is detected and aligned on its own, then all faces go through
+    the model together. Returns one normalized embedding (or None) per image.
+    """
+    faces=[]
+    slots=[]
+    client=DeepFace.build_model(model_name)
+    target_size=client.input_shape
+    for i,image in enumerate(images):
+        try:
+            out=DeepFace.extract_faces(img_path=image,detector_backend=detector_backend,enforce_detection=True,align=True)
+            faces.append(preprocess_face(out[0]['face'],target_size))
+            slots.append(i)
+        except Exception as e:
+            print(e)
+
+    results=[None]*len(images)
+    if not faces:
+        return results
+    embs=np.asarray(client.model(np.stack(faces),training=False),dtype=np.float32)
+    embs/=np.linalg.norm(embs,axis=1,keepdims=True)
+    for slot,emb in zip(slots,embs):
+        results[slot]=emb
+    return results
+
+def get_embeddings(image):
+    """Normalized embedding of a single image, or None (same preprocessing as the batch path)."""
+    return get_embeddings_batch([image])[0]
     
     
 def compare_embeddings(emb1,emb2,threshold=0.25):
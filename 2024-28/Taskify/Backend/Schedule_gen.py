@@ -1,7 +1,7 @@
 import warnings
 warnings.filterwarnings('ignore')
 
-from flask import Blueprint, render_template, flash, request, session, jsonify
+from flask import Blueprint, render_template, flash, request, session, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from .auth import login_check
 from .utils import process_doc, get_user_documents, get_context, process_schedule
@@ -83,6 +83,42 @@ def upload_docs():
 # 💬 CHAT SYSTEM
 # ====================================================================
 
+CHAT_FALLBACK_REPLY = "I'm your AI scheduling assistant! I can help you plan, organize, and stay productive."
+
+
+def build_chat_prompt(message, intent):
+    """Build the chat prompt for a user message and intent."""
+    # Context summary of latest schedules
+    context_summary = ""
+    if schedules:
+        recent = schedules[-5:]
+        lines = [f"- {s.get('title', 'Untitled')} ({len(s.get('tasks', []))} tasks)" for s in recent]
+        context_summary = "\nRecent schedules:\n" + "\n".join(lines)
+
+    # Dynamic prompt
+    if intent == 'schedule_prep':
+        return f"""You are a friendly AI scheduling assistant.
+The user said: "{message}"
+Acknowledge briefly (1-2 sentences) and mention you'll use this info when creating their schedule."""
+
+    return f"""You are a helpful AI schedule assistant.
+User asked: "{message}"
+{context_summary}
+
+Respond concisely. If it's about planning, remind them they can click 'Generate Schedule'."""
+
+
+def record_chat(session_id, message, response):
+    """Append a chat exchange to the user's history, keeping the latest 50."""
+    chats.setdefault(session_id, [])
+    chats[session_id].append({
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'user_message': message[:500],
+        'bot_response': response
+    })
+    chats[session_id] = chats[session_id][-50:]
+
+
 @schedule_bp.route("/api/chat/save-message", methods=['POST'])
 @login_check
 def save_message():
@@ -93,17 +129,7 @@ def save_message():
     if not message:
         return jsonify({"error": "Message is required"}), 400
 
-    session_id = session.get("username", "anon")
-    chats.setdefault(session_id, [])
-
-    chats[session_id].append({
-        'timestamp': datetime.now(timezone.utc).isoformat(),
-        'user_message': message[:500],
-        'bot_response': None
-    })
-
-    # Keep latest 50 messages
-    chats[session_id] = chats[session_id][-50:]
+    record_chat(session.get("username", "anon"), message, None)
     return jsonify({"status": "saved"}), 200
 
 
@@ -119,47 +145,70 @@ def chat():
         return jsonify({"error": "Message is required"}), 400
 
     try:
-        # Context summary of latest schedules
-        context_summary = ""
-        if schedules:
-            recent = schedules[-5:]
-            lines = [f"- {s.get('title', 'Untitled')} ({len(s.get('tasks', []))} tasks)" for s in recent]
-            context_summary = "\nRecent schedules:\n" + "\n".join(lines)
-
-        # Dynamic prompt
-        if intent == 'schedule_prep':
-            prompt = f"""You are a friendly AI scheduling assistant.
-The user said: "{message}"
-Acknowledge briefly (1-2 sentences) and mention you'll use this info when creating their schedule."""
-        else:
-            prompt = f"""You are a helpful AI schedule assistant.
-User asked: "{message}"
-{context_summary}
-
-Respond concisely. If it's about planning, remind them they can click 'Generate Schedule'."""
-
-        llm_response = llm.invoke(prompt)
+        llm_response = llm.invoke(build_chat_prompt(message, intent))
         reply = str(getattr(llm_response, 'content', llm_response)).strip()
 
         response = {"message": reply}
 
     except Exception as e:
         app_logger.error(f"Chat error: {e}")
-        response = {"message": "I'm your AI scheduling assistant! I can help you plan, organize, and stay productive."}
+        response = {"message": CHAT_FALLBACK_REPLY}
 
     # Save chat
-    session_id = session.get("username", "anon")
-    chats.setdefault(session_id, [])
-    chats[session_id].append({
-        'timestamp': datetime.now(timezone.utc).isoformat(),
-        'user_message': message[:500],
-        'bot_response': response
-    })
-    chats[session_id] = chats[session_id][-50:]
+    record_chat(session.get("username", "anon"), message, response)
 
     return jsonify(response)
 
 
+@schedule_bp.route("/api/chat/stream", methods=['POST'])
+@login_check
+def chat_stream():
+    """Stream the AI reply as Server-Sent Events while it is generated.
+
+    Each Gemini chunk is sent as a ``data: {"delta": ...}`` event and a final
+    ``event: done`` carries the full reply, which is also saved to the history.
+    """
+    data = request.get_json() or {}
+    message = (data.get('message', '') or '').strip()
+    intent = data.get('intent', 'chat')
+
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+
+    # Resolve session and prompt up front, the generator runs after the view returns
+    session_id = session.get("username", "anon")
+    prompt = build_chat_prompt(message, intent)
+
+    def sse(payload, event=None):
+        prefix = f"event: {event}\n" if event else ""
+        return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+    def generate():
+        parts = []
+        try:
+            for chunk in llm.stream(prompt):
+                text = str(getattr(chunk, 'content', chunk) or "")
+                if not text:
+                    continue
+                parts.append(text)
+                yield sse({"delta": text})
+        except Exception as e:
+            app_logger.error(f"Chat stream error: {e}")
+            if not parts:
+                parts.append(CHAT_FALLBACK_REPLY)
+                yield sse({"delta": CHAT_FALLBACK_REPLY})
+
+        response = {"message": "".join(parts).strip()}
+        record_chat(session_id, message, response)
+        yield sse(response, event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @schedule_bp.route("/api/chat/history", methods=['GET'])
 @login_check
 def chat_history():
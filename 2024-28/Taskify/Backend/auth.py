@@ -4,11 +4,17 @@ warnings.filterwarnings('ignore')
 from flask import Blueprint,request,flash,render_template,redirect,url_for,session,jsonify
 from flask_jwt_extended import create_access_token #type: ignore
 from werkzeug.security import generate_password_hash,check_password_hash
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from dotenv import load_dotenv
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 import os 
+import time
+import atexit
 import logging
+import threading
 from .utils import validate_password,validate_username
 from functools import wraps
 
@@ -24,9 +30,125 @@ client=MongoClient(os.getenv("MONGODB_URI"))
 db=client[os.getenv("DATABASE_NAME","Schedule_gen")]
 user_col=db[os.getenv("COLLECTION_NAME","Users")]
 
+
+def ensure_indexes():
+    """Create the indexes the auth queries rely on (idempotent)."""
+    try:
+        user_col.create_index("username", unique=True, name="username_unique")
+    except PyMongoError as e:
+        app_logger.error(f'Could not create username index: {str(e)}')
+
+
+# Short-lived cache of user documents so login bursts don't hit Mongo every time.
+# A password change drops this process's entry at once; another worker may still
+# hold the old hash until its entry expires, so the TTL is kept short.
+class UserCache:
+    def __init__(self, ttl=5, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.users = OrderedDict()  # username -> (expires, user), oldest first
+        self.lock = threading.Lock()
+
+    def get(self, username, fresh=False):
+        if not fresh:
+            with self.lock:
+                entry = self.users.get(username)
+                if entry and entry[0] > time.monotonic():
+                    return entry[1]
+                self.users.pop(username, None)
+        user = user_col.find_one({"username": username}, {"is_active": 0})
+        if user:
+            self.put(username, user)
+        else:
+            self.invalidate(username)
+        return user
+
+    def put(self, username, user):
+        with self.lock:
+            self.users.pop(username, None)
+            self.users[username] = (time.monotonic() + self.ttl, user)
+            # Every entry has the same TTL, so the oldest is also the first to expire
+            while len(self.users) > self.max_size:
+                self.users.popitem(last=False)
+
+    def invalidate(self, username):
+        with self.lock:
+            self.users.pop(username, None)
+
+
+# Collects last_login timestamps and writes them to Mongo in one bulk call
+class LastLoginWriter:
+    def __init__(self, interval=5):
+        self.interval = interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def record(self, user_id, when):
+        with self.lock:
+            self.pending[user_id] = when
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        try:
+            user_col.bulk_write(
+                [UpdateOne({'_id': uid}, {'$set': {'last_login': when}}) for uid, when in pending.items()],
+                ordered=False
+            )
+        except PyMongoError as e:
+            app_logger.error(f'Error writing last_login updates: {str(e)}')
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self.stop_event.set()
+        self.flush()
+
+
+user_cache = UserCache(ttl=int(os.getenv("USER_CACHE_TTL", 5)))
+last_login_writer = LastLoginWriter(interval=int(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", 5)))
+
+# Password hashing is CPU bound; a bounded pool caps how many hashes run at once.
+# The request thread still waits for its result, so this limits concurrency
+# (and CPU contention under login bursts), it does not shorten a request.
+hash_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2)),
+    thread_name_prefix="password-hash"
+)
+
+
+def hash_password(password):
+    """Hash on the bounded pool; blocks the caller until the hash is done."""
+    return hash_executor.submit(generate_password_hash, password).result()
+
+
+def verify_password(pw_hash, password):
+    """Check on the bounded pool; blocks the caller until the check is done."""
+    return hash_executor.submit(check_password_hash, pw_hash, password).result()
+
+
 # Setting up the blueprint
 bp = Blueprint("auth", __name__)
 
+
+@bp.record_once
+def on_register(state):
+    # Startup work runs when the app registers the blueprint, not on import
+    ensure_indexes()
+    last_login_writer.start()
+
 # Creating the register and login routes
 # Register Route
  
@@ -69,7 +191,7 @@ def register():
         
         # Step 3: Check if the username already exists in the database
         # This prevents duplicate accounts with the same username
-        existing_user = user_col.find_one({"username": username})
+        existing_user = user_cache.get(username)
 
         if existing_user:
             # Warn user to choose a different username
@@ -77,7 +199,7 @@ def register():
             return render_template("register.html")
         # Hashing the password
         try:
-            hashed_pass=generate_password_hash(password=password) #type: ignore
+            hashed_pass=hash_password(password) #type: ignore
         
             user_data={"username":username,
                    "password":hashed_pass,
@@ -85,7 +207,12 @@ def register():
                    'is_active': True
                    }
         
-            res=user_col.insert_one(user_data)
+            try:
+                res=user_col.insert_one(user_data)
+            except DuplicateKeyError:
+                # Lost a race with a concurrent registration, the unique index caught it
+                flash("Username already exists. Please choose a different username.", "warning")
+                return render_template("register.html")
         
             if res.inserted_id:
                 app_logger.info(f'New user registered: {username}')
@@ -107,7 +234,7 @@ def login():
     if request.method=='POST':
         username=request.form['username']
         password=request.form['password']
-        user=user_col.find_one({"username":username})
+        user=user_cache.get(username)
         
         if not user:
             flash("User does not exist , try again")
@@ -121,15 +248,16 @@ def login():
             flash("Password is required")
             return render_template("login.html")
         
-        if not check_password_hash(user['password'],password=password):
-            flash("Invalid Password , try again")
-            return render_template("login.html")
+        if not verify_password(user['password'],password):
+            # The cached hash may predate a password change made by another worker
+            fresh=user_cache.get(username, fresh=True)
+            if not fresh or fresh['password']==user['password'] or not verify_password(fresh['password'],password):
+                flash("Invalid Password , try again")
+                return render_template("login.html")
+            user=fresh
             
         try:
-            user_col.update_one(
-                {'_id': user['_id']},
-                {'$set': {'last_login': str(datetime.now())}}
-            )
+            last_login_writer.record(user['_id'], str(datetime.now()))
             
             # Creating session
             session['user_id']=str(user['_id'])
@@ -178,7 +306,7 @@ def change_password():
 # The function 'check_password_hash' compares the stored hashed password 
 
             # safer access using .get()
-            if not check_password_hash(user.get('password'), password):   #type: ignore
+            if not verify_password(user.get('password'), password):   #type: ignore
                flash("Invalid password. Please try again.", "warning")
             return render_template("change_password.html")
                         
@@ -193,11 +321,12 @@ def change_password():
                 return render_template("change_password.html")
             
             # updating password
-            hashed_pass=generate_password_hash(password=new_password)
+            hashed_pass=hash_password(new_password)
             user_col.update_one(
                 {'_id': user['_id']}, #type: ignore
                 {'$set': {'password': hashed_pass, 'last_login': datetime.utcnow()}}
             )
+            user_cache.invalidate(user.get('username'))
             
             flash("Password updated successfully", "success")
             return redirect(url_for('dashboard'))
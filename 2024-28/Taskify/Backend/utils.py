@@ -31,11 +31,29 @@ load_dotenv()
 
 # Embedding model, llm, vector store
 
-embedding_model = GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
-# Use a valid Groq model id; fall back to Gemini at runtime if Groq call fails
-helper_llm = ChatGroq(model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"), temperature=0.3)
-main_llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.3)
-vstore = PineconeVectorStore(index_name=os.getenv('INDEX_NAME'),embedding=embedding_model)
+embedding_model = None
+helper_llm = None
+main_llm = None
+vstore = None
+
+
+def init_clients(embedding=None, helper=None, main=None, store=None):
+    """Set up the embedding model, LLMs and vector store used by the pipeline.
+
+    Any client passed in is used as-is, the rest are created from the
+    environment. The benchmarks use this to swap in offline stand-ins.
+    """
+    global embedding_model, helper_llm, main_llm, vstore
+    embedding_model = embedding or GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
+    # Use a valid Groq model id; fall back to Gemini at runtime if Groq call fails
+    helper_llm = helper or ChatGroq(model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"), temperature=0.3)
+    main_llm = main or ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.3)
+    vstore = store or PineconeVectorStore(index_name=os.getenv('INDEX_NAME'),embedding=embedding_model)
+
+
+# TASKIFY_OFFLINE=1 skips creating the live clients so init_clients() can be called with stand-ins
+if os.getenv("TASKIFY_OFFLINE") != "1":
+    init_clients()
 
 
 
@@ -0,0 +1,178 @@
+"""Offline stand-ins for the Gemini/Groq LLMs, Gemini embeddings and Pinecone.
+
+Everything here is deterministic (given a seed) so benchmark runs can be
+compared against each other without any network access.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend", "examples.txt")
+
+
+# --------------------------------------------------------------------
+# Latency distributions
+# --------------------------------------------------------------------
+
+class Latency:
+    """Samples simulated call latencies in seconds.
+
+    ``kind`` is one of ``fixed``, ``uniform`` or ``lognormal``; ``mean`` and
+    ``spread`` are in milliseconds (``spread`` is the half-width for uniform
+    and sigma for lognormal).
+    """
+
+    def __init__(self, kind="fixed", mean=0.0, spread=0.0, seed=0):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        with self.lock:
+            if self.kind == "uniform":
+                ms = self.rng.uniform(self.mean - self.spread, self.mean + self.spread)
+            elif self.kind == "lognormal" and self.mean > 0:
+                # Keep the distribution's mean at `mean` regardless of sigma
+                mu = math.log(self.mean) - (self.spread ** 2) / 2
+                ms = self.rng.lognormvariate(mu, self.spread)
+            else:
+                ms = self.mean
+        return max(ms, 0.0) / 1000.0
+
+    @classmethod
+    def parse(cls, spec, seed=0):
+        """Build from a ``kind:mean[:spread]`` string, e.g. ``lognormal:800:0.4``."""
+        parts = spec.split(":")
+        kind = parts[0]
+        mean = float(parts[1]) if len(parts) > 1 else 0.0
+        spread = float(parts[2]) if len(parts) > 2 else 0.0
+        return cls(kind, mean, spread, seed=seed)
+
+
+# --------------------------------------------------------------------
+# Fake LLM
+# --------------------------------------------------------------------
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+def _canned_schedule():
+    with open(EXAMPLES_PATH, 'r') as f:
+        examples = json.load(f)
+    return json.dumps(examples[0]["output"]) if examples else "{}"
+
+
+CANNED_ANALYSIS = json.dumps({
+    "key_terms": ["python", "machine learning", "projects", "practice", "schedule"],
+    "intent": "study",
+    "time_preference": "evening",
+    "priority_focus": "learning",
+    "duration_hint": "short",
+    "context_type": "learning_materials",
+    "implicit_requirements": ["breaks", "deep focus"],
+    "success_metrics": ["topics completed"],
+    "constraints": ["1 hour per day"],
+    "related_concepts": ["programming", "statistics"]
+})
+
+
+class FakeLLM:
+    """Chat model stand-in answering each pipeline prompt with canned output.
+
+    The prompt type is recognised from the prompt text, so the real
+    ``pre_retrieval`` → ``doc_retrieval`` → ``reranking`` →
+    ``process_schedule`` code paths run unchanged.
+    """
+
+    def __init__(self, name, latency=None):
+        self.name = name
+        self.latency = latency or Latency()
+        self.schedule = _canned_schedule()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.local = threading.local()
+
+    def respond(self, prompt):
+        if "Analyze the user's request" in prompt:
+            return CANNED_ANALYSIS
+        if "Craft a concise search query" in prompt:
+            return "Weekly python and machine learning study plan with hands-on practice sessions"
+        if "Return ONLY a single number" in prompt:
+            # Stable pseudo-relevance per document excerpt
+            return str(int(hashlib.md5(prompt.encode()).hexdigest(), 16) % 10 + 1)
+        if "Return ONLY the ranking numbers" in prompt:
+            count = len(re.findall(r"^\[\d+\] Score:", prompt, flags=re.MULTILINE))
+            return ",".join(str(i) for i in range(1, count + 1))
+        return self.schedule
+
+    def invoke(self, prompt):
+        prompt = getattr(prompt, "text", None) or str(prompt)
+        with self.lock:
+            self.calls += 1
+        self.local.calls = getattr(self.local, "calls", 0) + 1
+        time.sleep(self.latency.sample())
+        return FakeMessage(self.respond(prompt))
+
+    def thread_calls(self):
+        """Number of calls made from the current thread so far."""
+        return getattr(self.local, "calls", 0)
+
+
+# --------------------------------------------------------------------
+# Deterministic embeddings
+# --------------------------------------------------------------------
+
+class HashEmbeddings(Embeddings):
+    """Feature-hashed bag-of-words embeddings, L2 normalised.
+
+    Texts sharing words end up close together, so retrieval behaves
+    sensibly, and the same text always maps to the same vector.
+    """
+
+    def __init__(self, dim=768, latency=None):
+        self.dim = dim
+        self.latency = latency or Latency()
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _embed(self, text):
+        vec = [0.0] * self.dim
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vec[bucket] += sign
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency.sample())
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency.sample())
+        return self._embed(text)
+
+
+def local_vector_store(embedding):
+    """In-process vector store standing in for Pinecone."""
+    return InMemoryVectorStore(embedding=embedding)
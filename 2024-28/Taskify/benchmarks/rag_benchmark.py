@@ -0,0 +1,186 @@
+"""Offline throughput/latency benchmark for the Taskify RAG pipeline.
+
+Runs the real ``process_doc`` → ``get_context`` → ``process_schedule`` code
+from ``Backend/utils.py`` against fake LLMs, hash embeddings and an
+in-memory vector store, so no Gemini, Groq or Pinecone access is needed.
+
+Usage (from the Taskify directory):
+
+    python -m benchmarks.rag_benchmark --docs 8 --requests 20 --concurrency 4 \
+        --helper-latency lognormal:300:0.5 --main-latency lognormal:2000:0.3
+"""
+import os
+
+# Must be set before Backend.utils is imported so it skips the live clients
+os.environ.setdefault("TASKIFY_OFFLINE", "1")
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Backend import utils
+from benchmarks.fakes import FakeLLM, HashEmbeddings, Latency, local_vector_store
+
+
+SAMPLE_QUERIES = [
+    "Create a 4 week plan to learn machine learning with 1 hour per day",
+    "I want to study python data structures for 2 hours every evening",
+    "Plan my RAG project work over the next month, 90 minutes a day",
+    "Help me prepare for exams in 3 weeks, studying mornings only",
+]
+
+SAMPLE_TOPICS = [
+    "Week one covers python basics, variables, loops and functions with daily coding practice.",
+    "Machine learning fundamentals: regression, classification, evaluation metrics and projects.",
+    "Retrieval augmented generation: chunking, embeddings, vector databases and reranking.",
+    "Study routine: spaced repetition, breaks every 50 minutes, weekly review sessions.",
+    "Deep learning roadmap: neural networks, CNNs, RNNs, transformers and fine-tuning.",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def summarize(name, latencies, wall_time, llm_calls=None):
+    result = {
+        "stage": name,
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "mean_ms": (statistics.mean(latencies) * 1000) if latencies else 0.0,
+        "throughput_per_s": (len(latencies) / wall_time) if wall_time > 0 else 0.0,
+    }
+    if llm_calls is not None:
+        result["llm_calls_per_request"] = statistics.mean(llm_calls) if llm_calls else 0.0
+    return result
+
+
+def make_sample_docs(out_dir, count, paragraphs=40):
+    """Write ``count`` synthetic DOCX files and return their paths."""
+    from docx import Document as DocxDocument
+
+    paths = []
+    for i in range(count):
+        doc = DocxDocument()
+        for p in range(paragraphs):
+            doc.add_paragraph(f"Section {p + 1}. " + SAMPLE_TOPICS[(i + p) % len(SAMPLE_TOPICS)])
+        path = os.path.join(out_dir, f"sample_{i + 1}.docx")
+        doc.save(path)
+        paths.append(path)
+    return paths
+
+
+def run_ingestion(paths, concurrency):
+    def ingest(path):
+        ext = path.rsplit('.', 1)[-1].lower()
+        start = time.perf_counter()
+        ok, msg = utils.process_doc(path, ext, username="bench")
+        if not ok:
+            raise RuntimeError(f"process_doc failed for {path}: {msg}")
+        return time.perf_counter() - start
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(ingest, paths))
+    return summarize("ingest (process_doc)", latencies, time.perf_counter() - wall_start)
+
+
+def run_generation(queries, concurrency, llms):
+    def thread_calls():
+        return sum(llm.thread_calls() for llm in llms)
+
+    def generate(query):
+        calls_before = thread_calls()
+        start = time.perf_counter()
+        context, _ = utils.get_context(query)
+        mid = time.perf_counter()
+        utils.process_schedule(query, context)
+        end = time.perf_counter()
+        return mid - start, end - mid, end - start, thread_calls() - calls_before
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(generate, queries))
+    wall_time = time.perf_counter() - wall_start
+
+    context_lat = [r[0] for r in results]
+    schedule_lat = [r[1] for r in results]
+    total_lat = [r[2] for r in results]
+    calls = [r[3] for r in results]
+    return [
+        summarize("get_context", context_lat, wall_time),
+        summarize("process_schedule", schedule_lat, wall_time),
+        summarize("end-to-end generation", total_lat, wall_time, llm_calls=calls),
+    ]
+
+
+def print_report(rows):
+    header = f"{'stage':<24}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'mean ms':>11}{'per s':>9}{'llm/req':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        llm = f"{r['llm_calls_per_request']:.1f}" if "llm_calls_per_request" in r else "-"
+        print(f"{r['stage']:<24}{r['count']:>6}{r['p50_ms']:>11.1f}{r['p95_ms']:>11.1f}"
+              f"{r['mean_ms']:>11.1f}{r['throughput_per_s']:>9.2f}{llm:>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Taskify RAG pipeline benchmark")
+    parser.add_argument("--docs", type=int, default=4, help="Number of synthetic documents to ingest")
+    parser.add_argument("--doc-dir", help="Ingest the PDF/DOCX files in this directory instead of synthetic ones")
+    parser.add_argument("--requests", type=int, default=8, help="Number of schedule generation requests")
+    parser.add_argument("--concurrency", type=int, default=1, help="Worker threads for ingestion and generation")
+    parser.add_argument("--helper-latency", default="fixed:0", help="Groq stand-in latency, kind:mean_ms[:spread]")
+    parser.add_argument("--main-latency", default="fixed:0", help="Gemini stand-in latency, kind:mean_ms[:spread]")
+    parser.add_argument("--embed-latency", default="fixed:0", help="Embedding stand-in latency, kind:mean_ms[:spread]")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the latency distributions")
+    parser.add_argument("--json", dest="json_out", help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own print output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    embedding = HashEmbeddings(latency=Latency.parse(args.embed_latency, seed=args.seed))
+    helper = FakeLLM("groq", latency=Latency.parse(args.helper_latency, seed=args.seed + 1))
+    main_llm = FakeLLM("gemini", latency=Latency.parse(args.main_latency, seed=args.seed + 2))
+    utils.init_clients(embedding=embedding, helper=helper, main=main_llm, store=local_vector_store(embedding))
+
+    queries = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] for i in range(args.requests)]
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.doc_dir:
+            paths = sorted(glob.glob(os.path.join(args.doc_dir, "*.pdf")) + glob.glob(os.path.join(args.doc_dir, "*.docx")))
+        else:
+            paths = make_sample_docs(tmp_dir, args.docs)
+
+        with quiet:
+            rows = [run_ingestion(paths, args.concurrency)]
+            rows += run_generation(queries, args.concurrency, [helper, main_llm])
+
+    print(f"\nTaskify RAG benchmark: {len(paths)} docs, {len(queries)} requests, concurrency {args.concurrency}")
+    print(f"embedding calls: {embedding.calls}, groq calls: {helper.calls}, gemini calls: {main_llm.calls}\n")
+    print_report(rows)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,103 +1,80 @@
 import cv2
-import face_recognition
-import pickle
-import os
-import pandas as pd
+import argparse
 from datetime import datetime
-from sklearn import neighbors
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
+
+from attendance_store import AttendanceLog
+from pipeline import RecognitionPipeline
+from shards import SectionSelector
+from tracker import FaceTracker
 
 # Parameters
 model = "hog"  # Switch to HOG for CPU-friendly face detection
-knn_neighbors = 3  # Number of neighbors for KNN
-unknown_threshold = 0.5  # Threshold for identifying unknown faces
 attendance_file = 'attendance.xlsx'
+attendance_log = 'attendance_log.csv'  # Append-only log every mark is written to
+export_interval = 30  # Seconds between Excel exports of the log
 required_identifications = 3  # Number of correct identifications needed
-
-# Load encodings and names from a file
-with open('encodings.pkl', 'rb') as f:
-    encodings, names = pickle.load(f)
-
-# Train a KNN classifier
-X_train, X_test, y_train, y_test = train_test_split(encodings, names, test_size=0.25, random_state=42)
-knn_clf = neighbors.KNeighborsClassifier(n_neighbors=knn_neighbors, algorithm='ball_tree', weights='distance')
-knn_clf.fit(X_train, y_train)
-
-# Evaluate model on test set
-y_pred = knn_clf.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f'Accuracy on test set: {accuracy:.2f}')
-
-# Load or create the attendance Excel file
-if not os.path.exists(attendance_file):
-    df = pd.DataFrame(columns=['Roll Number', 'Date', 'Time', 'Days'])
-    df.to_excel(attendance_file, index=False)
-else:
-    df = pd.read_excel(attendance_file)
-
-# Real-time recognition with webcam or video
-video_capture = cv2.VideoCapture(0)
-
-frame_count = 0  # Initialize frame counter
-identification_counts = {}  # Dictionary to store identification counts
-
-while True:
-    ret, frame = video_capture.read()
-    if not ret:
-        break
-
-    frame_count += 1
-    if frame_count % 2 != 0:  # Process every other frame
-        continue
-
-    rgb_frame = frame[:, :, ::-1]  # Convert to RGB
-    face_locations = face_recognition.face_locations(rgb_frame, model=model)
-    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-    for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-        # Find the best match for the face
-        distances, indices = knn_clf.kneighbors([face_encoding], n_neighbors=knn_neighbors)
-        name = "Unknown"
-
-        # Check if the closest known face is within the threshold
-        if distances[0][0] < unknown_threshold:
-            name = knn_clf.predict([face_encoding])[0]
-
-            # Increment identification count
-            if name in identification_counts:
-                identification_counts[name] += 1
-            else:
-                identification_counts[name] = 1
-
-            # Mark attendance if identified more than 3 times
-            if identification_counts[name] >= required_identifications:
-                current_date = datetime.now().date()
-                already_marked = df[(df['Roll Number'] == name) & (df['Date'] == str(current_date))]
-
-                if already_marked.empty:
-                    current_time = datetime.now().strftime('%H:%M:%S')
-
-                    # Check if the person already has a "Days" count
-                    if not df[df['Roll Number'] == name].empty:
-                        df.loc[df['Roll Number'] == name, 'Days'] += 1
-                    else:
-                        df = df.append({'Roll Number': name, 'Date': str(current_date), 'Time': current_time, 'Days': 1}, ignore_index=True)
-
-                    # Update the attendance file
-                    df.to_excel(attendance_file, index=False)
-                    print(f'Attendance marked for {name} at {current_time} on {current_date}')
-                identification_counts[name] = 0  # Reset after marking
-
-        # Draw rectangle around the face
-        cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
-        cv2.putText(frame, name, (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
-
-    cv2.imshow('Video', frame)
-
-    # Press 'Esc' to quit
-    if cv2.waitKey(1) & 0xFF == 27:
-        break
-
-video_capture.release()
-cv2.destroyAllWindows()
+recognition_workers = 2  # Processes running face detection and encoding
+detection_scale = 0.5  # Detect faces on the frame downscaled by this factor
+recheck_every = 15  # Re-encode a confirmed track after this many detections
+shard_cache_size = 4  # Section indexes kept in memory when switching rooms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Real-time face recognition attendance')
+    parser.add_argument('--section', help='Only recognize students of this section (see sections.json)')
+    parser.add_argument('--room', help='Pick the section from timetable.csv for this room')
+    args = parser.parse_args()
+
+    # Saved recognition index: the whole school, or just the section in front of the camera
+    selector = SectionSelector(args.section, args.room, shard_cache_size)
+    section, index = selector.current()
+    print(f'Recognizing {section or "all enrolled students"}')
+
+    # Open the attendance log; the Excel file is exported from it in the background
+    log = AttendanceLog(attendance_log, attendance_file, export_interval).start()
+
+    # Faces are followed across frames and only encoded when new or due for a recheck
+    tracker = FaceTracker(confirmations=required_identifications, recheck_every=recheck_every)
+
+    try:
+        # Real-time recognition with webcam or video; detection runs on worker processes
+        with RecognitionPipeline(0, recognition_workers, model, detection_scale) as pipeline:
+            for frame, detections in pipeline:
+                # A new class in the room: switch galleries and start tracking afresh
+                new_section, index = selector.current()
+                if new_section != section:
+                    section = new_section
+                    print(f'Recognizing {section or "all enrolled students"}')
+                    tracker = FaceTracker(confirmations=required_identifications, recheck_every=recheck_every)
+
+                for track, confirmed in tracker.process(detections, pipeline.encode, index.recognize):
+                    # Mark attendance once a track has been identified enough times in a row
+                    if confirmed and track.name != "Unknown" and not track.marked:
+                        track.marked = True
+                        now = datetime.now()
+                        days = log.mark(track.name, now)  # None if already marked today
+                        if days is not None:
+                            print(f'Attendance marked for {track.name} at {now:%H:%M:%S} on {now.date()} (day {days})')
+
+                # Draw rectangle around the faces
+                for track in tracker.tracks:
+                    if track.misses:
+                        continue
+                    top, right, bottom, left = track.box
+                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
+                    cv2.putText(frame, track.name, (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
+
+                cv2.imshow('Video', frame)
+
+                # Press 'Esc' to quit
+                if cv2.waitKey(1) & 0xFF == 27:
+                    break
+
+            print('Recognition: {processed} frames processed, {skipped} skipped, {avg_ms:.0f} ms per frame'.format(**pipeline.stats()))
+    finally:
+        cv2.destroyAllWindows()
+        log.close()  # Final export of attendance.xlsx, even if recognition failed
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import os
+import csv
+import threading
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+# Columns of both the log and the exported workbook
+COLUMNS = ['Roll Number', 'Date', 'Time', 'Days']
+
+
+class AttendanceLog:
+    """Append-only attendance log with a background Excel export.
+
+    Every mark is a single CSV line appended to ``log_file``, so marking costs
+    one small write no matter how many rows exist. ``excel_file`` is a derived
+    view that a background thread rewrites every ``export_interval`` seconds
+    when there are new marks, and once more on ``close()``.
+
+    The set of marked (roll, date) pairs and each roll's day count are kept
+    in memory, rebuilt from the log at startup, so ``mark()`` is a constant
+    time check however long the history grows.
+    """
+
+    def __init__(self, log_file='attendance_log.csv', excel_file='attendance.xlsx', export_interval=30.0):
+        self.log_file = log_file
+        self.excel_file = excel_file
+        self.export_interval = export_interval
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._exporter = None
+
+        if not os.path.exists(log_file):
+            self._create_log()
+        self._fh = open(log_file, 'a', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._fh)
+
+        self._marked = set()  # (roll number, date) pairs already marked
+        self._days = {}  # roll number -> days present
+        for row in self.rows():
+            self._index(row['Roll Number'], row['Date'], row['Days'])
+
+    def _index(self, roll_number, date, days):
+        self._marked.add((roll_number, date))
+        try:
+            days = int(float(days))
+        except (TypeError, ValueError):
+            days = 0
+        self._days[roll_number] = max(self._days.get(roll_number, 0), days)
+
+    def _create_log(self):
+        """Start a new log, carrying over the rows of an existing workbook."""
+        rows = []
+        if os.path.exists(self.excel_file):
+            old = pd.read_excel(self.excel_file, dtype=str)
+            rows = old.reindex(columns=COLUMNS).fillna('').values.tolist()
+        with open(self.log_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+
+    def rows(self):
+        """All logged marks as a list of dicts, oldest first."""
+        with self._lock:
+            self._fh.flush()
+            with open(self.log_file, newline='', encoding='utf-8') as f:
+                return list(csv.DictReader(f))
+
+    def to_frame(self):
+        df = pd.DataFrame(self.rows(), columns=COLUMNS)
+        df['Days'] = pd.to_numeric(df['Days'], errors='coerce').fillna(0).astype(int)
+        return df
+
+    def is_marked(self, roll_number, date):
+        return (roll_number, str(date)) in self._marked
+
+    def days(self, roll_number):
+        return self._days.get(roll_number, 0)
+
+    def mark(self, roll_number, when=None):
+        """Mark ``roll_number`` present at ``when`` (default now).
+
+        Returns the updated day count, or None if they were already marked
+        that day.
+        """
+        when = when or datetime.now()
+        date, time = str(when.date()), when.strftime('%H:%M:%S')
+        with self._lock:
+            if (roll_number, date) in self._marked:
+                return None
+            days = self._days.get(roll_number, 0) + 1
+            self._writer.writerow([roll_number, date, time, days])
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._index(roll_number, date, days)
+        self._dirty.set()
+        return days
+
+    def export(self):
+        """Rewrite the Excel workbook from the log (temp file + rename)."""
+        self._dirty.clear()
+        df = self.to_frame()
+        directory = os.path.dirname(os.path.abspath(self.excel_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.attendance-', suffix='.xlsx', dir=directory)
+        os.close(fd)
+        try:
+            df.to_excel(tmp_path, index=False)
+            os.replace(tmp_path, self.excel_file)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _run_exporter(self):
+        while not self._stop.wait(self.export_interval):
+            if self._dirty.is_set():
+                try:
+                    self.export()
+                except Exception as e:
+                    # The log still has the marks; the next round retries
+                    self._dirty.set()
+                    print(f'Excel export failed: {e}')
+
+    def start(self):
+        if self._exporter is None:
+            self._exporter = threading.Thread(target=self._run_exporter, name='excel-exporter', daemon=True)
+            self._exporter.start()
+        return self
+
+    def close(self):
+        """Stop the exporter and write the final workbook."""
+        self._stop.set()
+        if self._exporter is not None:
+            self._exporter.join()
+            self._exporter = None
+        if self._dirty.is_set() or not os.path.exists(self.excel_file):
+            self.export()
+        with self._lock:
+            self._fh.close()
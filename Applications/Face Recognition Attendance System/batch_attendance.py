@@ -0,0 +1,178 @@
+import os
+import csv
+import time
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+import cv2
+
+from attendance import model, required_identifications, detection_scale, recheck_every
+from pipeline import detect_faces, encode_faces, crop_face
+from recognition_index import INDEX_FILE, RecognitionIndex, load_index
+from shards import load_shard
+from tracker import FaceTracker
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+
+_index = None  # Recognition index, loaded once per worker process
+
+
+def _init_worker(index_file, section):
+    global _index
+    _index = load_shard(section) if section else RecognitionIndex.load(index_file)
+
+
+def find_videos(inputs):
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    # The same file given twice is one session
+    return list(dict.fromkeys(os.path.abspath(v) for v in videos))
+
+
+def plan_segments(videos, workers):
+    """Split the videos into (video, start frame, end frame, fps) tasks.
+
+    Each video is one task unless there are fewer videos than workers, then
+    long videos are cut into frame ranges so every worker has something to do.
+    """
+    info = []
+    for video in videos:
+        capture = cv2.VideoCapture(video)
+        if not capture.isOpened():
+            print(f'Cannot open {video}, skipping')
+            continue
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        capture.release()
+        info.append((video, frames, fps))
+
+    pieces = max(1, -(-workers // max(1, len(info))))  # ceil(workers / videos)
+    segments = []
+    for video, frames, fps in info:
+        if frames <= 0:
+            segments.append((video, 0, None, fps))  # Unknown length: read to the end
+            continue
+        step = -(-frames // pieces)
+        segments.extend((video, start, min(frames, start + step), fps) for start in range(0, frames, step))
+    return segments
+
+
+def _encode_now(frame, face_locations):
+    future = Future()
+    future.set_result(encode_faces([crop_face(frame, loc) for loc in face_locations]))
+    return future
+
+
+def process_segment(video, start, end, fps, sample_every):
+    """Recognize faces in one frame range of a video. Runs in a worker process.
+
+    Uses the same tracking and ``required_identifications`` rule as the live
+    camera. Returns the first time (seconds into the video) each roll number
+    was confirmed, plus frame counts and timing.
+    """
+    started = time.perf_counter()
+    capture = cv2.VideoCapture(video)
+    if start:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    tracker = FaceTracker(confirmations=required_identifications, recheck_every=recheck_every)
+    first_seen = {}
+    frame_no, processed = start, 0
+    while end is None or frame_no < end:
+        # grab() skips a frame without decoding it
+        if (frame_no - start) % sample_every:
+            if not capture.grab():
+                break
+            frame_no += 1
+            continue
+        ret, frame = capture.read()
+        if not ret:
+            break
+        face_locations, _ = detect_faces(frame, model, detection_scale)
+        for track, confirmed in tracker.process([(frame, face_locations)], _encode_now, _index.recognize):
+            if confirmed and track.name != "Unknown" and track.name not in first_seen:
+                first_seen[str(track.name)] = frame_no / fps
+        processed += 1
+        frame_no += 1
+    capture.release()
+    return {
+        'video': video,
+        'first_seen': first_seen,
+        'frames': frame_no - start,
+        'processed': processed,
+        'seconds': time.perf_counter() - started,
+        'worker': os.getpid(),
+    }
+
+
+def write_session(name, first_seen, output_dir):
+    """One attendance table per video: roll number and when they were first recognized."""
+    path = os.path.join(output_dir, f'{name}_attendance.csv')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Roll Number', 'First Seen'])
+        for roll_number, seconds in sorted(first_seen.items(), key=lambda item: item[1]):
+            writer.writerow([roll_number, time.strftime('%H:%M:%S', time.gmtime(seconds))])
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Take attendance from recorded videos, without a display')
+    parser.add_argument('inputs', nargs='+', help='Video files or directories of videos')
+    parser.add_argument('--output', default='sessions', help='Directory for the per-session attendance tables')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--sample-every', type=int, default=2, help='Recognize every Nth frame')
+    parser.add_argument('--index', default=INDEX_FILE, help='Recognition index file')
+    parser.add_argument('--section', help='Only recognize students of this section (see sections.json)')
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        parser.error('no videos found')
+    # Make sure the index exists and is current before the workers load it
+    if args.section:
+        load_shard(args.section)
+    else:
+        load_index(args.index)
+    os.makedirs(args.output, exist_ok=True)
+    workers = max(1, args.workers)
+    segments = plan_segments(videos, workers)
+    print(f'{len(videos)} videos in {len(segments)} segments on {workers} workers')
+
+    sessions = {video: {} for video, *_ in segments}
+    per_worker = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(args.index, args.section)) as pool:
+        futures = [pool.submit(process_segment, video, start, end, fps, max(1, args.sample_every))
+                   for video, start, end, fps in segments]
+        for future in as_completed(futures):
+            result = future.result()
+            seen = sessions[result['video']]
+            for roll_number, seconds in result['first_seen'].items():
+                seen[roll_number] = min(seconds, seen.get(roll_number, seconds))
+            stats = per_worker.setdefault(result['worker'], [0, 0, 0.0])
+            stats[0] += result['frames']
+            stats[1] += result['processed']
+            stats[2] += result['seconds']
+
+    names = set()
+    for video, first_seen in sessions.items():
+        name = base = os.path.splitext(os.path.basename(video))[0]
+        while name in names:  # Same file name in different directories
+            name = f'{base}_{len(names)}'
+        names.add(name)
+        path = write_session(name, first_seen, args.output)
+        print(f'{video}: {len(first_seen)} present -> {path}')
+
+    print(f'Done in {time.perf_counter() - started:.1f}s')
+    for worker, (frames, processed, seconds) in sorted(per_worker.items()):
+        print(f'worker {worker}: {frames} frames ({processed} recognized) in {seconds:.1f}s, '
+              f'{frames / seconds if seconds else 0:.1f} fps')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,23 @@
-import face_recognition
 import os
+import json
 import pickle
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import cv2
+import face_recognition
+import numpy as np
 
 # Directories for known faces
 KNOWN_FACES_DIR = 'known_faces'
+# Encodings matrix (float32, one row per face) with the roll number and source image of each row
+ENCODINGS_FILE = 'encodings.npz'
+# Size and mtime of every encoded image, so unchanged images are not encoded again
+MANIFEST_FILE = 'encodings_manifest.json'
+# Encodings written by earlier versions of this script
+LEGACY_ENCODINGS_FILE = 'encodings.pkl'
 
-# Lists to hold encodings and names
-encodings = []
-names = []
 
 # Load known faces and augment data
 def augment_image(image):
@@ -18,20 +27,118 @@ def augment_image(image):
     augmented_images.append(flip)
     return augmented_images
 
-for roll_number in os.listdir(KNOWN_FACES_DIR):
-    roll_dir = os.path.join(KNOWN_FACES_DIR, roll_number)
-    for filename in os.listdir(roll_dir):
-        image_path = os.path.join(roll_dir, filename)
-        if os.path.isfile(image_path):
-            image = face_recognition.load_image_file(image_path)
-            for aug_image in augment_image(image):
-                face_enc = face_recognition.face_encodings(aug_image)
-                if face_enc:
-                    encodings.append(face_enc[0])
-                    names.append(roll_number)
-
-# Save encodings and names to a file
-with open('encodings.pkl', 'wb') as f:
-    pickle.dump((encodings, names), f)
-
-print("Encodings have been precomputed and saved.")
+
+def encode_image(image_path):
+    """Encode one image and its augmentations. Runs in a worker process."""
+    image = face_recognition.load_image_file(image_path)
+    encodings = []
+    for aug_image in augment_image(image):
+        face_enc = face_recognition.face_encodings(aug_image)
+        if face_enc:
+            encodings.append(face_enc[0])
+    return np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+
+
+def scan_known_faces(known_faces_dir):
+    """Return {image path: (roll number, size, mtime_ns)} for every image."""
+    images = {}
+    for roll_number in sorted(os.listdir(known_faces_dir)):
+        roll_dir = os.path.join(known_faces_dir, roll_number)
+        if not os.path.isdir(roll_dir):
+            continue
+        for filename in sorted(os.listdir(roll_dir)):
+            image_path = os.path.join(roll_dir, filename)
+            if os.path.isfile(image_path):
+                st = os.stat(image_path)
+                images[image_path] = (roll_number, st.st_size, st.st_mtime_ns)
+    return images
+
+
+def load_encodings(path=ENCODINGS_FILE):
+    """Return (encodings matrix, roll numbers); falls back to the legacy pickle."""
+    if not os.path.exists(path) and os.path.exists(LEGACY_ENCODINGS_FILE):
+        with open(LEGACY_ENCODINGS_FILE, 'rb') as f:
+            encodings, names = pickle.load(f)
+        return np.asarray(encodings, dtype=np.float32).reshape(-1, 128), np.asarray(names)
+    with np.load(path) as data:
+        return data['encodings'], data['labels']
+
+
+def _load_previous(encodings_file, manifest_file):
+    """Previous rows grouped by source image, plus the manifest they were built from."""
+    if not (os.path.exists(encodings_file) and os.path.exists(manifest_file)):
+        return {}, {}
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    with np.load(encodings_file) as data:
+        encodings, paths = data['encodings'], data['paths']
+    # Group rows by image in one pass; images without a face have no rows
+    rows = {path: np.zeros((0, encodings.shape[1]), np.float32) for path in manifest}
+    order = np.argsort(paths, kind='stable')
+    unique_paths, starts = np.unique(paths[order], return_index=True)
+    for path, chunk in zip(unique_paths.tolist(), np.split(order, starts[1:])):
+        rows[path] = encodings[chunk]
+    return rows, manifest
+
+
+def _atomic_write(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.encodings-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def build(known_faces_dir=KNOWN_FACES_DIR, encodings_file=ENCODINGS_FILE, manifest_file=MANIFEST_FILE,
+          workers=None, full=False):
+    """Encode new and changed images across processes and rewrite the encodings file."""
+    images = scan_known_faces(known_faces_dir)
+    previous, manifest = ({}, {}) if full else _load_previous(encodings_file, manifest_file)
+
+    unchanged = {path for path, (_, size, mtime) in images.items()
+                 if manifest.get(path) == [size, mtime] and path in previous}
+    todo = [path for path in images if path not in unchanged]
+    print(f'{len(images)} images: {len(unchanged)} unchanged, {len(todo)} to encode')
+
+    encoded = {path: previous[path] for path in unchanged}
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for i, (path, rows) in enumerate(zip(todo, pool.map(encode_image, todo, chunksize=4)), 1):
+                encoded[path] = rows
+                if not len(rows):
+                    print(f'No face found in {path}')
+                if i % 100 == 0:
+                    print(f'Encoded {i}/{len(todo)}')
+
+    paths = sorted(encoded)
+    matrix = np.concatenate([encoded[p] for p in paths]) if paths else np.zeros((0, 128), np.float32)
+    labels = np.array([images[p][0] for p in paths for _ in range(len(encoded[p]))])
+    row_paths = np.array([p for p in paths for _ in range(len(encoded[p]))])
+
+    # Save encodings and names to a file
+    _atomic_write(encodings_file, lambda f: np.savez(f, encodings=matrix, labels=labels, paths=row_paths))
+    new_manifest = {p: [images[p][1], images[p][2]] for p in paths}
+    _atomic_write(manifest_file, lambda f: f.write(json.dumps(new_manifest, indent=1).encode()))
+    print(f'Saved {len(matrix)} encodings for {len(set(labels.tolist()))} people to {encodings_file}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute face encodings for the known faces')
+    parser.add_argument('--known-faces', default=KNOWN_FACES_DIR, help='Directory with one subfolder per roll number')
+    parser.add_argument('--output', default=ENCODINGS_FILE, help='Encodings file to write (.npz)')
+    parser.add_argument('--manifest', default=MANIFEST_FILE, help='Manifest of already encoded images')
+    parser.add_argument('--workers', type=int, help='Encoding processes (default: one per core)')
+    parser.add_argument('--full', action='store_true', help='Re-encode every image, ignoring the manifest')
+    args = parser.parse_args()
+    build(args.known_faces, args.output, args.manifest, args.workers, args.full)
+
+
+if __name__ == '__main__':
+    main()
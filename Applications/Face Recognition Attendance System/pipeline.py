@@ -0,0 +1,221 @@
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import cv2
+import face_recognition
+import numpy as np
+
+
+def detect_faces(frame, model='hog', scale=0.5):
+    """Find the faces in a BGR frame, detecting on a copy downscaled by ``scale``.
+
+    Runs in a worker process. Returns (face locations in full-frame
+    coordinates, seconds spent).
+    """
+    start = time.perf_counter()
+    small = cv2.resize(frame, (0, 0), fx=scale, fy=scale) if scale != 1 else frame
+    rgb_small = np.ascontiguousarray(small[:, :, ::-1])  # Convert to RGB
+    height, width = frame.shape[:2]
+    face_locations = [
+        (max(0, int(top / scale)), min(width, int(right / scale)),
+         min(height, int(bottom / scale)), max(0, int(left / scale)))
+        for top, right, bottom, left in face_recognition.face_locations(rgb_small, model=model)
+    ]
+    return face_locations, time.perf_counter() - start
+
+
+def encode_faces(crops):
+    """Encode faces from (crop, location within the crop) pairs. Runs in a worker process."""
+    encodings = []
+    for crop, location in crops:
+        rgb_crop = np.ascontiguousarray(crop[:, :, ::-1])
+        encodings.append(face_recognition.face_encodings(rgb_crop, [location])[0])
+    return encodings
+
+
+def _encode_timed(crops):
+    start = time.perf_counter()
+    return encode_faces(crops), time.perf_counter() - start
+
+
+def crop_face(frame, location, margin=0.25):
+    """Cut a face with some margin out of the full-resolution frame for encoding."""
+    top, right, bottom, left = location
+    pad = int(max(right - left, bottom - top) * margin)
+    height, width = frame.shape[:2]
+    y0, x0 = max(0, top - pad), max(0, left - pad)
+    y1, x1 = min(height, bottom + pad), min(width, right + pad)
+    return frame[y0:y1, x0:x1].copy(), (top - y0, right - x0, bottom - y0, left - x0)
+
+
+class FrameGrabber:
+    """Reads a video source on its own thread and keeps only the newest frame.
+
+    The camera is drained at its own rate, so frames never queue up behind
+    slow recognition; a reader always gets the most recent one.
+    """
+
+    def __init__(self, source=0):
+        self.capture = cv2.VideoCapture(source)
+        self.running = True
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._thread = threading.Thread(target=self._run, name='frame-grabber', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self.running:
+            ret, frame = self.capture.read()
+            with self._cond:
+                if not ret:
+                    self.running = False
+                else:
+                    self._frame = frame
+                    self._seq += 1
+                self._cond.notify_all()
+
+    def read(self, after=0, timeout=1.0):
+        """Wait for a frame newer than sequence number ``after``.
+
+        Returns (seq, frame), or (after, None) on timeout or once the source
+        has ended (check ``running`` to tell them apart).
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after or not self.running, timeout)
+            if self._seq > after:
+                return self._seq, self._frame
+            return after, None
+
+    def release(self):
+        self.running = False
+        self._thread.join(timeout=1.0)
+        self.capture.release()
+
+
+class RecognitionPipeline:
+    """Capture thread plus a process pool for face detection and encoding.
+
+    Every captured frame is yielded for display, together with the
+    detections that finished since the previous frame, in the order their
+    frames were captured. Detection runs on a frame downscaled by
+    ``scale``; encoding is requested separately with ``encode()`` so the
+    caller can skip faces it is already tracking.
+
+    Instead of a fixed "every other frame", a frame is sent to the pool only
+    when a worker is free and at least ``avg_time / workers`` has passed
+    since the last one was sent, ``avg_time`` being a moving average of the
+    measured processing time, including the encoding requested for it. The
+    skip rate follows what the machine can actually keep up with, and at
+    most ``workers`` jobs (detections and encodings) are ever in flight, so
+    the recognition lag stays around one processing time.
+    """
+
+    def __init__(self, source=0, workers=2, model='hog', scale=0.5, smoothing=0.2):
+        self.source = source
+        self.workers = max(1, workers)
+        self.model = model
+        self.scale = scale
+        self.smoothing = smoothing
+        self.avg_time = 0.0  # Moving average of worker seconds per processed frame
+        self.processed = 0
+        self.skipped = 0
+        self._grabber = None
+        self._pool = None
+        self._pending = deque()
+        self._encoding = []  # Encode jobs still in flight
+        self._encode_times = deque()  # Seconds of finished encodes, filled by the pool's thread
+        self._last_dispatch = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        # Spawn, not fork: forking after the capture thread has started can
+        # copy its locks (OpenCV's, the allocator's) while held and hang a worker
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self._grabber = FrameGrabber(self.source)
+
+    def close(self):
+        if self._grabber is not None:
+            self._grabber.release()
+            self._grabber = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _dispatch(self, frame):
+        now = time.perf_counter()
+        self._encoding = [job for job in self._encoding if not job.done()]
+        if len(self._pending) + len(self._encoding) >= self.workers or now - self._last_dispatch < self.avg_time / self.workers:
+            self.skipped += 1
+            return
+        self._last_dispatch = now
+        # The worker gets its own copy; the caller draws on the yielded frame
+        frame = frame.copy()
+        self._pending.append((frame, self._pool.submit(detect_faces, frame, self.model, self.scale)))
+
+    def _collect(self, wait=False):
+        """Pop finished detections from the front of the queue, keeping capture order."""
+        results = []
+        while self._pending and (wait or self._pending[0][1].done()):
+            frame, future = self._pending.popleft()
+            face_locations, seconds = future.result()
+            # Encodes finished since the last sample count towards this frame's cost
+            while self._encode_times:
+                seconds += self._encode_times.popleft()
+            if self.processed == 0:
+                self.avg_time = seconds
+            else:
+                self.avg_time += self.smoothing * (seconds - self.avg_time)
+            self.processed += 1
+            results.append((frame, face_locations))
+        return results
+
+    def encode(self, frame, face_locations):
+        """Encode the given faces of ``frame`` on the pool; returns a Future of the encodings."""
+        job = self._pool.submit(_encode_timed, [crop_face(frame, loc) for loc in face_locations])
+        self._encoding.append(job)
+        future = Future()
+        job.add_done_callback(lambda job: self._encoded(job, future))
+        return future
+
+    def _encoded(self, job, future):
+        """Record an encode job's time and hand its encodings to ``future``."""
+        if job.cancelled():
+            future.cancel()
+        elif job.exception() is not None:
+            future.set_exception(job.exception())
+        else:
+            encodings, seconds = job.result()
+            self._encode_times.append(seconds)
+            future.set_result(encodings)
+
+    def __iter__(self):
+        """Yield (frame, [(detected frame, face locations)]) for every captured frame."""
+        seq, frame = 0, None
+        while True:
+            seq, latest = self._grabber.read(seq)
+            if latest is None:
+                if not self._grabber.running:
+                    break
+                continue
+            frame = latest
+            self._dispatch(frame)
+            yield frame, self._collect()
+        if frame is not None and self._pending:
+            yield frame, self._collect(wait=True)
+
+    def stats(self):
+        return {
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'avg_ms': self.avg_time * 1000,
+        }
@@ -0,0 +1,145 @@
+import os
+import time
+import pickle
+import argparse
+import tempfile
+
+import numpy as np
+import sklearn
+from sklearn import neighbors
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+
+from face1 import ENCODINGS_FILE, LEGACY_ENCODINGS_FILE, load_encodings
+
+# Parameters
+INDEX_FILE = 'recognition_index.pkl'
+knn_neighbors = 3  # Number of neighbors for KNN
+unknown_threshold = 0.5  # Threshold for identifying unknown faces
+
+
+def source_stamp(encodings_file):
+    """(path, size, mtime_ns) of the encodings the index is built from."""
+    if not os.path.exists(encodings_file) and os.path.exists(LEGACY_ENCODINGS_FILE):
+        encodings_file = LEGACY_ENCODINGS_FILE
+    st = os.stat(encodings_file)
+    return [encodings_file, st.st_size, st.st_mtime_ns]
+
+
+class RecognitionIndex:
+    """A fitted KNN over every known encoding, saved to disk once and reloaded.
+
+    Holds the ball tree, the labels, the unknown threshold and some build
+    metadata (source encodings, sizes, sklearn version), so starting the
+    camera is an unpickle instead of a fit.
+    """
+
+    def __init__(self, classifier, threshold, metadata):
+        self.classifier = classifier
+        self.threshold = threshold
+        self.metadata = metadata
+
+    @classmethod
+    def build(cls, encodings, labels, n_neighbors=knn_neighbors, threshold=unknown_threshold, **metadata):
+        classifier = neighbors.KNeighborsClassifier(n_neighbors=min(n_neighbors, len(labels)),
+                                                    algorithm='ball_tree', weights='distance')
+        classifier.fit(encodings, labels)
+        metadata.update({
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'encodings': len(labels),
+            'people': len(set(np.asarray(labels).tolist())),
+            'n_neighbors': classifier.n_neighbors,
+            'sklearn': sklearn.__version__,
+        })
+        return cls(classifier, threshold, metadata)
+
+    def recognize(self, face_encoding):
+        """Roll number of the closest known face, or "Unknown" if it is too far."""
+        distances, indices = self.classifier.kneighbors([face_encoding])
+
+        # Check if the closest known face is within the threshold
+        if distances[0][0] < self.threshold:
+            return self.classifier.predict([face_encoding])[0]
+        return "Unknown"
+
+    def save(self, path=INDEX_FILE):
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.index-', dir=directory)
+        try:
+            # A plain dict, so the file does not depend on where this class is imported from
+            state = {'classifier': self.classifier, 'threshold': self.threshold, 'metadata': self.metadata}
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with open(path, 'rb') as f:
+            index = cls(**pickle.load(f))
+        if index.metadata.get('sklearn') != sklearn.__version__:
+            print(f"Index {path} was built with scikit-learn {index.metadata.get('sklearn')}, "
+                  f"running {sklearn.__version__}; rebuild it if recognition misbehaves")
+        return index
+
+
+def build_index(encodings_file=ENCODINGS_FILE, index_file=INDEX_FILE, n_neighbors=knn_neighbors,
+                threshold=unknown_threshold):
+    encodings, labels = load_encodings(encodings_file)
+    index = RecognitionIndex.build(encodings, labels, n_neighbors, threshold, source=source_stamp(encodings_file))
+    index.save(index_file)
+    return index
+
+
+def load_index(index_file=INDEX_FILE, encodings_file=ENCODINGS_FILE):
+    """Load the saved index, rebuilding it first if the encodings changed since."""
+    if os.path.exists(index_file):
+        index = RecognitionIndex.load(index_file)
+        if index.metadata.get('source') == source_stamp(encodings_file):
+            return index
+        print('Encodings changed since the recognition index was built, rebuilding it')
+        # Keep the settings it was built with
+        return build_index(encodings_file, index_file, index.metadata.get('n_neighbors', knn_neighbors), index.threshold)
+    return build_index(encodings_file, index_file)
+
+
+def evaluate(encodings_file=ENCODINGS_FILE, n_neighbors=knn_neighbors, threshold=unknown_threshold, test_size=0.25):
+    """Offline accuracy check on a held-out split; not needed to run attendance."""
+    encodings, names = load_encodings(encodings_file)
+    X_train, X_test, y_train, y_test = train_test_split(encodings, names, test_size=test_size, random_state=42)
+    index = RecognitionIndex.build(X_train, y_train, n_neighbors, threshold)
+
+    # Evaluate model on test set
+    y_pred = index.classifier.predict(X_test)
+    print(f'Accuracy on test set: {accuracy_score(y_test, y_pred):.2f}')
+    y_thresholded = [index.recognize(encoding) for encoding in X_test]
+    rejected = sum(name == "Unknown" for name in y_thresholded)
+    print(f'Accuracy with the unknown threshold {threshold}: {accuracy_score(y_test, y_thresholded):.2f} '
+          f'({rejected} of {len(y_test)} rejected as unknown)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or evaluate the face recognition index')
+    parser.add_argument('command', choices=['build', 'evaluate', 'info'])
+    parser.add_argument('--encodings', default=ENCODINGS_FILE, help='Encodings written by face1.py')
+    parser.add_argument('--index', default=INDEX_FILE, help='Recognition index file')
+    parser.add_argument('--neighbors', type=int, default=knn_neighbors, help='Number of neighbors for KNN')
+    parser.add_argument('--threshold', type=float, default=unknown_threshold, help='Distance above which a face is unknown')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build_index(args.encodings, args.index, args.neighbors, args.threshold)
+        print(f'Saved {args.index}: {index.metadata}')
+    elif args.command == 'evaluate':
+        evaluate(args.encodings, args.neighbors, args.threshold)
+    else:
+        print(RecognitionIndex.load(args.index).metadata)
+
+
+if __name__ == '__main__':
+    main()
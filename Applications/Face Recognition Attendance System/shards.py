@@ -0,0 +1,161 @@
+import os
+import csv
+import json
+import time
+import argparse
+from datetime import datetime
+from collections import OrderedDict
+
+import numpy as np
+
+from face1 import ENCODINGS_FILE, load_encodings
+from recognition_index import RecognitionIndex, knn_neighbors, unknown_threshold, load_index, source_stamp
+
+# Parameters
+SECTIONS_FILE = 'sections.json'  # {"section": ["roll number", ...]}
+TIMETABLE_FILE = 'timetable.csv'  # room,day,start,end,section
+SHARD_DIR = 'indexes'  # One recognition index per section
+
+
+def load_sections(sections_file=SECTIONS_FILE):
+    with open(sections_file, encoding='utf-8') as f:
+        return {section: {str(roll) for roll in rolls} for section, rolls in json.load(f).items()}
+
+
+def _shard_source(encodings_file, sections_file):
+    st = os.stat(sections_file)
+    return [source_stamp(encodings_file), [sections_file, st.st_size, st.st_mtime_ns]]
+
+
+def _shard_path(section, shard_dir):
+    safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in section)
+    return os.path.join(shard_dir, f'{safe}.pkl')
+
+
+def build_shards(sections=None, sections_file=SECTIONS_FILE, encodings_file=ENCODINGS_FILE, shard_dir=SHARD_DIR,
+                 n_neighbors=knn_neighbors, threshold=unknown_threshold):
+    """Build the index of each section from its students' encodings (all sections by default)."""
+    rosters = load_sections(sections_file)
+    encodings, labels = load_encodings(encodings_file)
+    labels = labels.astype(str)
+    source = _shard_source(encodings_file, sections_file)
+    os.makedirs(shard_dir, exist_ok=True)
+    built = {}
+    for section in sections or sorted(rosters):
+        if section not in rosters:
+            raise KeyError(f'Unknown section {section!r} (not in {sections_file})')
+        mask = np.isin(labels, list(rosters[section]))
+        if not mask.any():
+            print(f'No encodings for anyone in section {section}, skipping')
+            continue
+        index = RecognitionIndex.build(encodings[mask], labels[mask], n_neighbors, threshold,
+                                       source=source, section=section)
+        index.save(_shard_path(section, shard_dir))
+        built[section] = index
+        missing = rosters[section] - set(labels[mask].tolist())
+        print(f'{section}: {index.metadata["people"]} people, {index.metadata["encodings"]} encodings'
+              + (f', not enrolled: {", ".join(sorted(missing))}' if missing else ''))
+    return built
+
+
+def load_shard(section, sections_file=SECTIONS_FILE, encodings_file=ENCODINGS_FILE, shard_dir=SHARD_DIR):
+    """Load one section's index, rebuilding it if the encodings or rosters changed."""
+    path = _shard_path(section, shard_dir)
+    if os.path.exists(path):
+        index = RecognitionIndex.load(path)
+        if index.metadata.get('source') == _shard_source(encodings_file, sections_file):
+            return index
+    built = build_shards([section], sections_file, encodings_file, shard_dir)
+    if section not in built:
+        raise KeyError(f'Section {section!r} has no enrolled faces')
+    return built[section]
+
+
+class ShardCache:
+    """Section indexes loaded on demand, keeping the ``capacity`` most recently used.
+
+    A kiosk serving several rooms switches between a few sections a day; each
+    query only searches the current class instead of the whole institution.
+    """
+
+    def __init__(self, capacity=4, sections_file=SECTIONS_FILE, encodings_file=ENCODINGS_FILE, shard_dir=SHARD_DIR):
+        self.capacity = max(1, capacity)
+        self.sections_file = sections_file
+        self.encodings_file = encodings_file
+        self.shard_dir = shard_dir
+        self._cache = OrderedDict()
+
+    def get(self, section):
+        if section in self._cache:
+            self._cache.move_to_end(section)
+            return self._cache[section]
+        index = load_shard(section, self.sections_file, self.encodings_file, self.shard_dir)
+        self._cache[section] = index
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return index
+
+
+def current_section(room, when=None, timetable_file=TIMETABLE_FILE):
+    """Section scheduled in ``room`` at ``when`` (default now), or None.
+
+    Timetable rows are ``room,day,start,end,section`` with day as Mon..Sun
+    (or * for every day) and times as HH:MM.
+    """
+    when = when or datetime.now()
+    day, now = when.strftime('%a'), when.strftime('%H:%M')
+    with open(timetable_file, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row['room'] != room or row['day'] not in ('*', day):
+                continue
+            if row['start'] <= now < row['end']:
+                return row['section']
+    return None
+
+
+class SectionSelector:
+    """Chooses the index for a camera: a fixed section, the room's timetable slot, or everyone.
+
+    With a room, the timetable is checked every ``check_every`` seconds;
+    outside any slot, or if the section is unknown or has nobody enrolled,
+    the full index is used.
+    """
+
+    def __init__(self, section=None, room=None, cache_size=4, check_every=60):
+        self.section = section
+        self.room = room
+        self.check_every = check_every
+        self.shards = ShardCache(cache_size)
+        self._checked = None
+        self._active = section
+        self._everyone = None
+
+    def current(self):
+        """Return (section or None, index)."""
+        if self.room and (self._checked is None or time.monotonic() - self._checked >= self.check_every):
+            self._checked = time.monotonic()
+            self._active = current_section(self.room)
+        if self._active is not None:
+            try:
+                return self._active, self.shards.get(self._active)
+            except KeyError as e:
+                # A timetable typo or an empty section must not stop attendance
+                print(f'Cannot use section {self._active} ({e.args[0]}), recognizing all enrolled students')
+                self._active = None
+        if self._everyone is None:
+            self._everyone = load_index()
+        return None, self._everyone
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build per-section recognition indexes')
+    parser.add_argument('sections', nargs='*', help='Sections to build (default: all in the sections file)')
+    parser.add_argument('--sections-file', default=SECTIONS_FILE)
+    parser.add_argument('--encodings', default=ENCODINGS_FILE)
+    parser.add_argument('--output', default=SHARD_DIR, help='Directory for the section indexes')
+    args = parser.parse_args()
+    build_shards(args.sections or None, args.sections_file, args.encodings, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import numpy as np
+
+
+def box_iou(a, b):
+    """IoU matrix between two arrays of (top, right, bottom, left) boxes."""
+    a = np.asarray(a, dtype=float).reshape(-1, 4)
+    b = np.asarray(b, dtype=float).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    """One face followed across frames."""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.name = "Unknown"
+        self.hits = 0  # Identifications in a row that agreed on self.name
+        self.misses = 0  # Detection rounds without a matching face
+        self.age = 0  # Detection rounds since the last encoding
+        self.pending = None  # (Future, index) of an encoding in progress
+        self.marked = False  # Attendance already marked for this track
+
+
+class FaceTracker:
+    """Associates detected faces across frames by IoU, falling back to centroid distance.
+
+    A face only needs the 128-d encoding and KNN while its track is new
+    (until ``confirmations`` identifications agree on a known name) and then
+    every ``recheck_every`` detection rounds to confirm it is still the same
+    person. Standing still in front of the camera costs a detection only.
+    Tracks still "Unknown" are encoded every round, since a few blurred or
+    angled frames at the door should not stop a student from being marked.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=5, confirmations=3, recheck_every=15):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.confirmations = confirmations
+        self.recheck_every = recheck_every
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, boxes):
+        """Match this round's detections to tracks; returns the tracks seen this round."""
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        unmatched = set(range(len(boxes)))
+        seen = []
+        if self.tracks and boxes:
+            iou = box_iou([t.box for t in self.tracks], boxes)
+            used = set()
+            # Greedy: best overlapping pairs first
+            for ti, di in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[ti, di] < self.iou_threshold:
+                    break
+                if ti in used or di not in unmatched:
+                    continue
+                used.add(ti)
+                unmatched.discard(di)
+                self._assign(self.tracks[ti], boxes[di], seen)
+            # Fast movers may not overlap their last box; take the nearest centre within a box width
+            for ti, track in enumerate(self.tracks):
+                if ti in used or not unmatched:
+                    continue
+                di = min(unmatched, key=lambda d: _centre_distance(track.box, boxes[d]))
+                if _centre_distance(track.box, boxes[di]) < _box_size(track.box):
+                    used.add(ti)
+                    unmatched.discard(di)
+                    self._assign(track, boxes[di], seen)
+
+        for track in self.tracks:
+            if track not in seen:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for di in sorted(unmatched):
+            track = Track(self._next_id, boxes[di])
+            self._next_id += 1
+            self.tracks.append(track)
+            seen.append(track)
+        return seen
+
+    def _assign(self, track, box, seen):
+        track.box = box
+        track.misses = 0
+        track.age += 1
+        seen.append(track)
+
+    def needs_encoding(self, track):
+        """New, unconfirmed or unknown tracks, or confirmed ones due for a recheck."""
+        if track.pending is not None:
+            return False
+        if track.hits < self.confirmations or track.name == "Unknown":
+            return True
+        return track.age >= self.recheck_every
+
+    def identify(self, track, name):
+        """Record one recognition of ``track``; returns True once it is confirmed."""
+        if name == track.name:
+            track.hits += 1
+        else:
+            track.name = name
+            track.hits = 1
+            track.marked = False
+        track.age = 0
+        return track.hits >= self.confirmations
+
+    def process(self, detections, encode, recognize):
+        """Run a batch of pipeline detections through the tracker.
+
+        ``detections`` is [(frame, face locations)], ``encode(frame, locations)``
+        returns a Future of encodings and ``recognize(encoding)`` a name.
+        Encodings are requested only for tracks that need one. Returns the
+        (track, confirmed) pairs whose encodings finished by now.
+        """
+        for frame, face_locations in detections:
+            todo = [t for t in self.update(face_locations) if self.needs_encoding(t)]
+            if todo:
+                future = encode(frame, [t.box for t in todo])
+                for i, track in enumerate(todo):
+                    track.pending = (future, i)
+
+        identified = []
+        for track in self.tracks:
+            if track.pending is None or not track.pending[0].done():
+                continue
+            future, i = track.pending
+            track.pending = None
+            if future.exception() is None:
+                identified.append((track, self.identify(track, recognize(future.result()[i]))))
+        return identified
+
+
+def _centre_distance(a, b):
+    return np.hypot((a[0] + a[2] - b[0] - b[2]) / 2, (a[1] + a[3] - b[1] - b[3]) / 2)
+
+
+def _box_size(box):
+    return max(box[1] - box[3], box[2] - box[0])
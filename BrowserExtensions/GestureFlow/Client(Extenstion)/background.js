@@ -23,12 +23,15 @@ function pollServer() {
 
 // Listen for messages from content scripts
 chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
-  if (message.type === "frame") {
+  if (message.type === "action") {
+    // Gesture recognized from a frame the content script sent over the WebSocket
+    handleAction(message.action);
+  } else if (message.type === "frame") {
     sendFrameToServer(message.data);
   }
 });
 
-// Function to send frame data to the server
+// Function to send frame data to the server (fallback when the WebSocket is down)
 function sendFrameToServer(frameData) {
   fetch("http://127.0.0.1:5000/send", {
     method: "POST",
@@ -39,69 +42,74 @@ function sendFrameToServer(frameData) {
   })
     .then((response) => response.json())
     .then((data) => {
-      console.log(data["action"]);
-      if (data["action"] === "rs") {
-        chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
-          if (tabs.length > 0) {
-            const currentTabIndex = tabs[0].index;
-            chrome.tabs.query({ windowId: tabs[0].windowId }, (allTabs) => {
-              if (allTabs.length > 0) {
-                const nextTabIndex = (currentTabIndex + 1) % allTabs.length;
-                chrome.tabs.update(allTabs[nextTabIndex].id, { active: true });
-              }
-            });
+      handleAction(data["action"]);
+    })
+    .catch((error) => {
+      console.error("Send error:", error);
+    });
+}
+
+// Carry out a gesture action returned by the server
+function handleAction(action) {
+  console.log(action);
+  if (action === "rs") {
+    chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
+      if (tabs.length > 0) {
+        const currentTabIndex = tabs[0].index;
+        chrome.tabs.query({ windowId: tabs[0].windowId }, (allTabs) => {
+          if (allTabs.length > 0) {
+            const nextTabIndex = (currentTabIndex + 1) % allTabs.length;
+            chrome.tabs.update(allTabs[nextTabIndex].id, { active: true });
           }
         });
       }
-      else if(data["action"] === "ls") {
-        chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
-            if (tabs.length > 0) {
-                const currentTabIndex = tabs[0].index;
-                chrome.tabs.query({ windowId: tabs[0].windowId }, (allTabs) => {
-                    if (allTabs.length > 0) {
-                        const prevTabIndex = (currentTabIndex - 1 + allTabs.length) % allTabs.length;
-                        chrome.tabs.update(allTabs[prevTabIndex].id, { active: true });
-                    }
-                });
-            }
-        });        
-      }
-      else if(data["action"] === "sd"){
-        chrome.tabs.query({active: true, currentWindow: true}, function(tabs) {
-            var activeTab = tabs[0];
-            chrome.scripting.executeScript({
-                target: {tabId: activeTab.id},
-                func: scrollPageDown
+    });
+  }
+  else if(action === "ls") {
+    chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
+        if (tabs.length > 0) {
+            const currentTabIndex = tabs[0].index;
+            chrome.tabs.query({ windowId: tabs[0].windowId }, (allTabs) => {
+                if (allTabs.length > 0) {
+                    const prevTabIndex = (currentTabIndex - 1 + allTabs.length) % allTabs.length;
+                    chrome.tabs.update(allTabs[prevTabIndex].id, { active: true });
+                }
             });
+        }
+    });        
+  }
+  else if(action === "sd"){
+    chrome.tabs.query({active: true, currentWindow: true}, function(tabs) {
+        var activeTab = tabs[0];
+        chrome.scripting.executeScript({
+            target: {tabId: activeTab.id},
+            func: scrollPageDown
         });
-      }
-      else if(data["action"] === "su"){
-        chrome.tabs.query({active: true, currentWindow: true}, function(tabs) {
-            var activeTab = tabs[0];
-            chrome.scripting.executeScript({
-                target: {tabId: activeTab.id},
-                func: scrollPageUp
-            });
+    });
+  }
+  else if(action === "su"){
+    chrome.tabs.query({active: true, currentWindow: true}, function(tabs) {
+        var activeTab = tabs[0];
+        chrome.scripting.executeScript({
+            target: {tabId: activeTab.id},
+            func: scrollPageUp
         });
-      }
-      else if(data["action"] === "zi"){
-        chrome.tabs.query({ active: true, currentWindow: true }, function(tabs) {
-            chrome.tabs.getZoom(tabs[0].id, function(zoomFactor) {
-              chrome.tabs.setZoom(tabs[0].id, zoomFactor + 0.1);
-            });
-          });
-      }
-      else if(data["action"] === "zo"){
-        chrome.tabs.query({ active: true, currentWindow: true }, function(tabs) {
-            chrome.tabs.getZoom(tabs[0].id, function(zoomFactor) {
-              chrome.tabs.setZoom(tabs[0].id, zoomFactor - 0.1);
-            });
-          });
-      }
-    })
-    .catch((error) => {
-      console.error("Send error:", error);
     });
+  }
+  else if(action === "zi"){
+    chrome.tabs.query({ active: true, currentWindow: true }, function(tabs) {
+        chrome.tabs.getZoom(tabs[0].id, function(zoomFactor) {
+          chrome.tabs.setZoom(tabs[0].id, zoomFactor + 0.1);
+        });
+      });
+  }
+  else if(action === "zo"){
+    chrome.tabs.query({ active: true, currentWindow: true }, function(tabs) {
+        chrome.tabs.getZoom(tabs[0].id, function(zoomFactor) {
+          chrome.tabs.setZoom(tabs[0].id, zoomFactor - 0.1);
+        });
+      });
+  }
 }
 
 pollServer();
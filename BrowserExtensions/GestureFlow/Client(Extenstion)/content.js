@@ -1,5 +1,41 @@
 // content.js
 
+const SERVER_WS_URL = 'ws://127.0.0.1:5000/ws';
+// Reconnect delay doubles after every failed attempt, up to the maximum
+const RECONNECT_MIN_MS = 1000;
+const RECONNECT_MAX_MS = 30000;
+// While the socket is down, frames are posted to /send at most this often
+const FALLBACK_INTERVAL_MS = 200;
+
+let reconnectDelay = RECONNECT_MIN_MS;
+let lastFallbackFrame = 0;
+
+// Frames go to the server as binary JPEG over a WebSocket. Only one frame is
+// in flight at a time: the next is captured once the server has answered, so
+// frames never queue up behind a slow detector.
+function openFrameSocket() {
+    const socket = new WebSocket(SERVER_WS_URL);
+    socket.waiting = false;
+    socket.onopen = () => {
+        reconnectDelay = RECONNECT_MIN_MS;
+    };
+    socket.onmessage = (event) => {
+        socket.waiting = false;
+        const action = JSON.parse(event.data).action;
+        if (action !== 'hmm') {
+            chrome.runtime.sendMessage({ type: 'action', action: action });
+        }
+    };
+    socket.onclose = () => {
+        console.log(`Frame socket closed, retrying in ${reconnectDelay / 1000}s`);
+        setTimeout(() => { frameSocket = openFrameSocket(); }, reconnectDelay);
+        reconnectDelay = Math.min(reconnectDelay * 2, RECONNECT_MAX_MS);
+    };
+    return socket;
+}
+
+let frameSocket = null;
+
 async function startCamera() {
     try {
         console.log("Starting camera");
@@ -30,12 +66,43 @@ async function startCamera() {
         const canvas = document.createElement('canvas');
         const context = canvas.getContext('2d');
 
+        if (!frameSocket) {
+            frameSocket = openFrameSocket();
+        }
+
         setInterval(() => {
-            canvas.width = videoElement.videoWidth;
-            canvas.height = videoElement.videoHeight;
-            context.drawImage(videoElement, 0, 0, canvas.width, canvas.height);
-            const frame = canvas.toDataURL('image/jpeg');
-            chrome.runtime.sendMessage({ type: 'frame', data: frame });
+            if (!videoElement.videoWidth) {
+                return;
+            }
+            // Resizing clears and reallocates the canvas, so only do it when the video size changes
+            if (canvas.width !== videoElement.videoWidth || canvas.height !== videoElement.videoHeight) {
+                canvas.width = videoElement.videoWidth;
+                canvas.height = videoElement.videoHeight;
+            }
+            if (frameSocket.readyState === WebSocket.OPEN) {
+                if (frameSocket.waiting) {
+                    return;
+                }
+                frameSocket.waiting = true;
+                context.drawImage(videoElement, 0, 0, canvas.width, canvas.height);
+                const socket = frameSocket;
+                canvas.toBlob((blob) => {
+                    if (blob && socket.readyState === WebSocket.OPEN) {
+                        socket.send(blob);
+                    } else {
+                        socket.waiting = false;
+                    }
+                }, 'image/jpeg', 0.8);
+            } else {
+                // No WebSocket (older server): fall back to posting data URLs through the background script
+                if (Date.now() - lastFallbackFrame < FALLBACK_INTERVAL_MS) {
+                    return;
+                }
+                lastFallbackFrame = Date.now();
+                context.drawImage(videoElement, 0, 0, canvas.width, canvas.height);
+                const frame = canvas.toDataURL('image/jpeg');
+                chrome.runtime.sendMessage({ type: 'frame', data: frame });
+            }
         }, 33);
 
     } catch (error) {
@@ -1,5 +1,7 @@
 import cv2
+import json
 from flask import Flask, jsonify, request
+from flask_sock import Sock
 import time
 import threading
 import base64
@@ -9,6 +11,7 @@ import numpy as np
 from hand1 import HandDetector
 
 app = Flask(__name__)
+sock = Sock(app)
 
 # Store data in memory for simplicity (use a database or message queue for production)
 data_store = []
@@ -42,6 +45,14 @@ def pillow_image_to_opencv(pillow_image):
     return image_np
 
 
+def jpeg_to_rgb(jpeg_bytes):
+    # Decode straight from the received buffer; MediaPipe wants RGB
+    image_np = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image_np is None:
+        return None
+    return cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB)
+
+
 @app.route('/poll')
 def poll():
     def get_data():
@@ -55,7 +66,7 @@ def poll():
     return get_data()
 
 @app.route('/send', methods=['POST'])
-async def send():
+def send():
     global last_action_time
 
     current_time = time.time()
@@ -69,10 +80,30 @@ async def send():
     image_np = pillow_image_to_opencv(image)
 
     # Custom timestamp management
-    action = await detector.gestureControl(image_np)
+    action = detector.gestureControl(image_np)
 
     data_event.set()
     return jsonify({'status': 'data received', 'action': action}), 200
 
+
+@sock.route('/ws')
+def frames(ws):
+    # Each binary message is one JPEG frame; the action for it is sent back
+    # before the client sends the next one, so every message gets a reply.
+    # Every connection gets its own detector so gesture state is not shared
+    # between tabs.
+    hand_detector = HandDetector()
+    while True:
+        message = ws.receive()
+        if not isinstance(message, bytes):
+            ws.send(json.dumps({'action': 'hmm', 'error': 'expected a binary JPEG frame'}))
+            continue
+        image_rgb = jpeg_to_rgb(message)
+        if image_rgb is None:
+            ws.send(json.dumps({'action': 'hmm', 'error': 'could not decode frame'}))
+            continue
+        action = hand_detector.gestureControl(image_rgb, draw=False, isRGB=True)
+        ws.send(json.dumps({'action': action}))
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
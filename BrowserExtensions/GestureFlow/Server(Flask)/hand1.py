@@ -33,8 +33,8 @@ class HandDetector:
         self.right_threshold = 270
         self.start_time = 0
 
-    def findHands(self, img, draw=True, flipType=True):
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    def findHands(self, img, draw=True, flipType=True, isRGB=False):
+        imgRGB = img if isRGB else cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         self.results = self.hands.process(imgRGB)
         allHands = []
         h, w, c = img.shape
@@ -120,8 +120,9 @@ class HandDetector:
         else:
             return length, info
 
-    async def gestureControl(self, img):
-        hands, img = self.findHands(img)
+    def gestureControl(self, img, draw=True, isRGB=False):
+        # draw=False skips the landmark overlays when nobody looks at the frame
+        hands, img = self.findHands(img, draw=draw, isRGB=isRGB)
         h, w, _ = img.shape  # get the dimensions of the image
         left_corner_threshold = w // 5  # define left corner threshold as 1/5th of the width
         right_corner_threshold = 4 * w // 5
@@ -141,7 +142,7 @@ class HandDetector:
                 and not fingers1[3]
                 and not fingers1[4]
             ):
-                length, info, _ = self.findDistance(lmList1[4][0:2], lmList1[8][0:2], img)
+                length, info = self.findDistance(lmList1[4][0:2], lmList1[8][0:2], img if draw else None)[:2]
                 if not self.zoom_started and length < 50:
                     self.zoom_started = True
                 if self.zoom_started and length > 120:
@@ -160,7 +161,7 @@ class HandDetector:
                 and not fingers1[3]
                 and not fingers1[4]
             ):
-                length, info, _ = self.findDistance(lmList1[4][0:2], lmList1[8][0:2], img)
+                length, info = self.findDistance(lmList1[4][0:2], lmList1[8][0:2], img if draw else None)[:2]
                 if not self.zout_started and length > 120:
                     self.zout_started = True
                 if self.zout_started and length < 50:
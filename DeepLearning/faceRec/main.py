@@ -1,5 +1,8 @@
 import os
 import cv2
+import json
+import hashlib
+import tempfile
 import numpy as np
 from keras.applications import MobileNetV2
 from keras.applications.mobilenet_v2 import preprocess_input
@@ -9,71 +12,201 @@ from mtcnn import MTCNN
 import tkinter as tk
 from tkinter import simpledialog
 import time
+import queue
+import argparse
 import threading
 
 base_model = MobileNetV2(weights='imagenet', include_top=False, pooling='avg')
 model = Model(inputs=base_model.input, outputs=base_model.output)
 
-def extract_features(img_path):
+def load_face_file(img_path):
     try:
         img = image.load_img(img_path, target_size=(224, 224))
     except Exception as e:
         print(f"Error loading image {img_path}: {e}")
         return None
-    img_data = image.img_to_array(img)
-    img_data = np.expand_dims(img_data, axis=0)
-    img_data = preprocess_input(img_data)
-    features = model.predict(img_data)
-    features = features.flatten()
-    features = features / np.linalg.norm(features)
+    return image.img_to_array(img)
+
+def extract_features_files(img_paths, batch_size=32):
+    """Normalized features for image files, predicted in batches. Returns {path: features}."""
+    features = {}
+    for start in range(0, len(img_paths), batch_size):
+        loaded = [(path, load_face_file(path)) for path in img_paths[start:start + batch_size]]
+        loaded = [(path, img) for path, img in loaded if img is not None]
+        if not loaded:
+            continue
+        batch = preprocess_input(np.stack([img for _, img in loaded]))
+        output = np.asarray(model(batch, training=False), dtype=np.float32)
+        output /= np.maximum(np.linalg.norm(output, axis=1, keepdims=True), 1e-12)
+        for (path, _), row in zip(loaded, output):
+            features[path] = row
     return features
 
+def extract_features(img_path):
+    return extract_features_files([img_path]).get(img_path)
+
+def preprocess_faces(face_images):
+    # Frames are BGR; the known faces are loaded as RGB, so convert to match
+    batch = np.empty((len(face_images), 224, 224, 3), dtype=np.float32)
+    for i, face_image in enumerate(face_images):
+        batch[i] = cv2.cvtColor(cv2.resize(face_image, (224, 224)), cv2.COLOR_BGR2RGB)
+    return preprocess_input(batch)
+
+def extract_features_batch(face_images):
+    """Normalized features for all face crops of a frame, in order, from one forward pass."""
+    if len(face_images) == 0:
+        return np.zeros((0, model.output_shape[-1]), dtype=np.float32)
+    # Calling the model directly avoids model.predict's per-call setup
+    features = np.asarray(model(preprocess_faces(face_images), training=False), dtype=np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.maximum(norms, 1e-12)
+
 def extract_features_from_frame(face_image):
-    img = cv2.resize(face_image, (224, 224))
-    img = image.img_to_array(img)
-    img = np.expand_dims(img, axis=0)
-    img = preprocess_input(img)
-    features = model.predict(img)
-    features = features.flatten()
-    features = features / np.linalg.norm(features)
-    return features
+    return extract_features_batch([face_image])[0]
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_manifest(manifest, manifest_path):
+    fd, tmp_path = tempfile.mkstemp(prefix='.manifest-', dir=os.path.dirname(manifest_path))
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
 
 def build_encodings(known_faces_dir='known_faces', encodings_dir='encodings'):
+    """Encode only images that are new or whose content changed.
+
+    encodings/manifest.json maps every image under known_faces to its size,
+    mtime, content hash and .npy file. Images with an unchanged stat are
+    skipped without reading them; otherwise the content hash decides, and
+    an image whose content was already encoded elsewhere reuses that
+    encoding. The remaining images are predicted in batches.
+
+    Returns ({person: [new encodings]}, replaced), replaced being True when
+    existing encodings were changed or removed and the gallery needs a reload
+    instead of just adding the new ones.
+    """
     if not os.path.exists(encodings_dir):
         os.makedirs(encodings_dir)
-    
-    for person_name in os.listdir(known_faces_dir):
+    manifest_path = os.path.join(encodings_dir, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    by_hash = {entry['sha1']: entry['encoding'] for entry in manifest.values()
+               if os.path.exists(os.path.join(encodings_dir, entry['encoding']))}
+
+    new_manifest = {}
+    added = {}
+    replaced = False
+    todo = []
+    for person_name in sorted(os.listdir(known_faces_dir)):
         person_dir = os.path.join(known_faces_dir, person_name)
         if not os.path.isdir(person_dir):
             continue
         person_encodings_dir = os.path.join(encodings_dir, person_name)
         if not os.path.exists(person_encodings_dir):
             os.makedirs(person_encodings_dir)
-        for img_name in os.listdir(person_dir):
+        for img_name in sorted(os.listdir(person_dir)):
             img_path = os.path.join(person_dir, img_name)
-            features = extract_features(img_path)
-            if features is not None:
-                encoding_filename = os.path.splitext(img_name)[0] + '.npy'
-                encoding_path = os.path.join(person_encodings_dir, encoding_filename)
+            if not os.path.isfile(img_path):
+                continue
+            key = f"{person_name}/{img_name}"
+            encoding_file = f"{person_name}/{os.path.splitext(img_name)[0]}.npy"
+            encoding_path = os.path.join(encodings_dir, encoding_file)
+            st = os.stat(img_path)
+            entry = manifest.get(key)
+            if (entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns
+                    and os.path.exists(encoding_path)):
+                new_manifest[key] = entry
+                continue
+
+            sha1 = file_sha1(img_path)
+            new_entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': sha1, 'encoding': encoding_file}
+            if entry and entry['sha1'] == sha1 and os.path.exists(encoding_path):
+                new_manifest[key] = new_entry  # Touched but not changed
+                continue
+            replaced = replaced or entry is not None
+            if sha1 in by_hash:
+                features = np.load(os.path.join(encodings_dir, by_hash[sha1]))
                 np.save(encoding_path, features)
-        print(f"Encodings for {person_name} saved.")
-
-def prompt_user_for_name():
-    def get_name():
-        root = tk.Tk()
-        root.withdraw()
-        user_input = simpledialog.askstring(title="New Face Detected",
-                                            prompt="Enter the name for the new face:")
-        root.destroy()
-        nonlocal name
-        name = user_input
-
-    name = None
-    thread = threading.Thread(target=get_name)
-    thread.start()
-    thread.join()
+                new_manifest[key] = new_entry
+                added.setdefault(person_name, []).append(features)
+            else:
+                todo.append((key, person_name, img_path, encoding_path, new_entry))
+
+    if todo:
+        print(f"Encoding {len(todo)} new or changed images...")
+    features = extract_features_files([img_path for _, _, img_path, _, _ in todo])
+    for key, person_name, img_path, encoding_path, new_entry in todo:
+        if img_path not in features:
+            continue
+        np.save(encoding_path, features[img_path])
+        new_manifest[key] = new_entry
+        added.setdefault(person_name, []).append(features[img_path])
+
+    # Images deleted from known_faces take their encodings with them
+    kept = {entry['encoding'] for entry in new_manifest.values()}
+    for key, entry in manifest.items():
+        if key not in new_manifest and entry['encoding'] not in kept:
+            replaced = True
+            try:
+                os.remove(os.path.join(encodings_dir, entry['encoding']))
+            except OSError:
+                pass
+
+    save_manifest(new_manifest, manifest_path)
+    for person_name, encodings in added.items():
+        print(f"Encodings for {person_name} saved ({len(encodings)} new).")
+    return added, replaced
+
+def prompt_user_for_name(face_count=None):
+    """Ask for a name with a Tk dialog; runs on the enrollment thread, not the video loop."""
+    root = tk.Tk()
+    root.withdraw()
+    prompt = "Enter the name for the new face:"
+    if face_count:
+        prompt = f"Enter the name for the new face ({face_count} captures):"
+    name = simpledialog.askstring(title="New Face Detected", prompt=prompt)
+    root.destroy()
     return name
 
+def enroll_faces(person_name, face_images, face_encodings, known_faces_dir='known_faces', encodings_dir='encodings'):
+    """Save labeled crops with the encodings already computed for them.
+
+    The images go to known_faces/<person_name> and the encodings straight to
+    encodings/<person_name> plus the manifest, so nothing is predicted again.
+    """
+    person_dir = os.path.join(known_faces_dir, person_name)
+    person_encodings_dir = os.path.join(encodings_dir, person_name)
+    os.makedirs(person_dir, exist_ok=True)
+    os.makedirs(person_encodings_dir, exist_ok=True)
+    manifest_path = os.path.join(encodings_dir, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    timestamp = int(time.time())
+    serial = 0
+    for face_img, face_encoding in zip(face_images, face_encodings):
+        # Never overwrite earlier captures of the same person
+        while os.path.exists(os.path.join(person_dir, f"{timestamp}_{serial}.jpg")):
+            serial += 1
+        stem = f"{timestamp}_{serial}"
+        img_path = os.path.join(person_dir, f"{stem}.jpg")
+        cv2.imwrite(img_path, face_img)
+        encoding_file = f"{person_name}/{stem}.npy"
+        np.save(os.path.join(encodings_dir, encoding_file), face_encoding)
+        st = os.stat(img_path)
+        manifest[f"{person_name}/{stem}.jpg"] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                                                 'sha1': file_sha1(img_path), 'encoding': encoding_file}
+    save_manifest(manifest, manifest_path)
+
 def load_known_encodings(encodings_dir='encodings'):
     encodings = {}
     for person_name in os.listdir(encodings_dir):
@@ -87,43 +220,358 @@ def load_known_encodings(encodings_dir='encodings'):
                 encodings[person_name].append(encoding)
     return encodings
 
-def recognize_face(face_encoding, known_encodings, threshold=0.75):
-    min_dist = float('inf')
-    identity = "Unknown"
-    for name, encodings in known_encodings.items():
-        if len(encodings) == 0:
-            continue
-        encodings_np = np.array(encodings)
-        distances = np.linalg.norm(encodings_np - face_encoding, axis=1)
-        min_distance = np.min(distances)
-        if min_distance < min_dist and min_distance < threshold:
-            min_dist = min_distance
-            identity = name
-    return identity
+class Gallery:
+    """Known encodings stacked into one float32 matrix with a parallel label array.
+
+    The matrix is only rebuilt when enrollment changes; matching a frame is
+    one matrix product for all faces against all templates. Updates swap in
+    new arrays in one assignment, so the enrollment thread can add people
+    while the video loop keeps matching.
+    """
+    def __init__(self, known_encodings=None):
+        self._lock = threading.Lock()
+        self.set(known_encodings or {})
+
+    @staticmethod
+    def _stack(matrix, labels):
+        return matrix, labels, np.einsum('ij,ij->i', matrix, matrix)
+
+    def set(self, known_encodings):
+        rows, labels = [], []
+        for name, encodings in known_encodings.items():
+            rows.extend(encodings)
+            labels.extend([name] * len(encodings))
+        matrix = np.asarray(rows, dtype=np.float32).reshape(len(rows), -1) if rows else np.zeros((0, 0), np.float32)
+        with self._lock:
+            self._state = self._stack(matrix, np.asarray(labels, dtype=object))
+
+    def add(self, name, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(len(encodings), -1)
+        with self._lock:
+            matrix, labels, _ = self._state
+            matrix = np.vstack([matrix, encodings]) if len(matrix) else encodings
+            labels = np.concatenate([labels, np.asarray([name] * len(encodings), dtype=object)])
+            self._state = self._stack(matrix, labels)
+
+    @property
+    def labels(self):
+        return self._state[1]
+
+    def __len__(self):
+        return len(set(self.labels))
+
+    def match(self, face_encodings, threshold=0.75):
+        """Closest known name for each encoding, or "Unknown" if none is within threshold."""
+        face_encodings = np.asarray(face_encodings, dtype=np.float32)
+        matrix, labels, sq_norms = self._state
+        if len(face_encodings) == 0:
+            return []
+        if len(matrix) == 0:
+            return ["Unknown"] * len(face_encodings)
+        # Squared euclidean distances, faces x templates
+        sq = np.einsum('ij,ij->i', face_encodings, face_encodings)
+        d2 = sq[:, None] + sq_norms[None, :] - 2.0 * face_encodings @ matrix.T
+        # The nearest template overall belongs to the label with the smallest distance
+        best = np.argmin(d2, axis=1)
+        distances = np.sqrt(np.maximum(d2[np.arange(len(best)), best], 0.0))
+        return [labels[b] if d < threshold else "Unknown" for b, d in zip(best, distances)]
+
+class UnknownCluster:
+    def __init__(self, face_encoding, face_img):
+        self.total = face_encoding.astype(np.float32).copy()
+        self.centroid = self.total / np.linalg.norm(self.total)
+        self.face_encodings = [face_encoding]
+        self.face_images = [face_img]
+        self.last_seen = time.monotonic()
+        self.state = 'collecting'  # then 'queued' for labeling, or 'ignored' if no name was given
+
+    def add(self, face_encoding, face_img, max_size):
+        self.total += face_encoding
+        self.centroid = self.total / np.linalg.norm(self.total)
+        self.last_seen = time.monotonic()
+        if len(self.face_images) < max_size:
+            self.face_encodings.append(face_encoding)
+            self.face_images.append(face_img)
+
+class UnknownClusters:
+    """Online clustering of unrecognized faces, so one prompt covers one person.
+
+    Each unknown embedding joins the cluster with the nearest centroid (a
+    running mean) within ``radius``, or starts a new one. A cluster is
+    returned for labeling once it holds ``min_size`` faces; clusters not
+    seen for ``expire_after`` seconds are forgotten.
+    """
+    def __init__(self, radius=0.75, min_size=20, expire_after=30.0):
+        self.radius = radius
+        self.min_size = min_size
+        self.expire_after = expire_after
+        self.clusters = []
+        self._lock = threading.Lock()
+
+    def add(self, face_encoding, face_img):
+        """Record an unknown face; returns its cluster if it just became ready to label."""
+        now = time.monotonic()
+        with self._lock:
+            self.clusters = [c for c in self.clusters
+                             if c.state == 'queued' or now - c.last_seen < self.expire_after]
+            cluster = None
+            if self.clusters:
+                distances = np.linalg.norm(np.stack([c.centroid for c in self.clusters]) - face_encoding, axis=1)
+                nearest = int(np.argmin(distances))
+                if distances[nearest] < self.radius:
+                    cluster = self.clusters[nearest]
+            if cluster is None:
+                cluster = UnknownCluster(face_encoding, face_img)
+                self.clusters.append(cluster)
+            else:
+                cluster.add(face_encoding, face_img, self.min_size)
+            if cluster.state == 'collecting' and len(cluster.face_images) >= self.min_size:
+                cluster.state = 'queued'
+                return cluster
+        return None
+
+    def resolve(self, cluster, enrolled):
+        with self._lock:
+            if enrolled:
+                self.clusters = [c for c in self.clusters if c is not cluster]
+            else:
+                cluster.state = 'ignored'  # Don't ask again while this person stays around
+
+class Enroller:
+    """Asks for names and enrolls clusters on a background thread.
+
+    The video loop only puts ready clusters on a queue; the dialog, writing
+    the images and growing the gallery all happen here, so recognition never
+    stops for labeling.
+    """
+    def __init__(self, gallery, clusters, known_faces_dir='known_faces', encodings_dir='encodings'):
+        self.gallery = gallery
+        self.clusters = clusters
+        self.known_faces_dir = known_faces_dir
+        self.encodings_dir = encodings_dir
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='enroller', daemon=True)
+        self.thread.start()
+
+    def submit(self, cluster):
+        self.queue.put(cluster)
+
+    def _run(self):
+        while True:
+            cluster = self.queue.get()
+            if cluster is None:
+                return
+            person_name = prompt_user_for_name(len(cluster.face_images))
+            if person_name:
+                enroll_faces(person_name, cluster.face_images, cluster.face_encodings,
+                             self.known_faces_dir, self.encodings_dir)
+                self.gallery.add(person_name, cluster.face_encodings)
+                print(f"Added {person_name} to known faces.")
+            else:
+                print("No name entered. Unknown face not added.")
+            self.clusters.resolve(cluster, bool(person_name))
+
+    def stop(self):
+        self.queue.put(None)
+
+def recognize_face(face_encoding, gallery, threshold=0.75):
+    return gallery.match([face_encoding], threshold)[0]
+
+class FaceDetector:
+    """Finds faces in a BGR frame and returns (x, y, w, h) boxes."""
+    name = 'base'
+
+    def detect(self, frame):
+        raise NotImplementedError
+
+class MTCNNDetector(FaceDetector):
+    name = 'mtcnn'
+
+    def __init__(self):
+        self.detector = MTCNN()
+
+    def detect(self, frame):
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return [tuple(d['box']) for d in self.detector.detect_faces(rgb_frame)]
+
+class HaarDetector(FaceDetector):
+    """OpenCV's frontal face Haar cascade; by far the cheapest, less robust to pose."""
+    name = 'haar'
+
+    def __init__(self, cascade_path=None):
+        if not hasattr(cv2, 'CascadeClassifier'):
+            raise IOError("This OpenCV build has no Haar cascades (moved out of OpenCV 5), use mtcnn or dnn")
+        cascade_path = cascade_path or os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise IOError(f"Could not load Haar cascade {cascade_path}")
+
+    def detect(self, frame):
+        gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40))
+        return [tuple(int(v) for v in face) for face in faces]
+
+class DNNDetector(FaceDetector):
+    """OpenCV DNN face detector (res10 300x300 SSD, Caffe).
+
+    Needs deploy.prototxt and res10_300x300_ssd_iter_140000.caffemodel from
+    the OpenCV face detector samples.
+    """
+    name = 'dnn'
+
+    def __init__(self, model_path='res10_300x300_ssd_iter_140000.caffemodel', config_path='deploy.prototxt',
+                 confidence=0.5):
+        if not (os.path.exists(model_path) and os.path.exists(config_path)):
+            raise IOError(f"DNN face detector needs {config_path} and {model_path}")
+        self.net = cv2.dnn.readNetFromCaffe(config_path, model_path)
+        self.confidence = confidence
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        faces = []
+        for detection in detections[detections[:, 2] >= self.confidence]:
+            x1, y1, x2, y2 = (detection[3:7] * np.array([w, h, w, h])).astype(int)
+            faces.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        return faces
+
+DETECTORS = {'mtcnn': MTCNNDetector, 'haar': HaarDetector, 'dnn': DNNDetector}
+
+def create_detector(name, **kwargs):
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector {name!r}, choose from {', '.join(DETECTORS)}")
+    return DETECTORS[name](**kwargs)
+
+class FlowTracker:
+    """Moves face boxes between detections with sparse Lucas-Kanade optical flow.
+
+    Each box follows the median motion of corner points found inside it.
+    A box whose points are mostly lost is dropped and ``lost`` is set, so
+    the caller can run a full detection early. A face with too little
+    texture to track (small, blurred, flat lighting) has no points; it
+    stays at its detected box until the next scheduled detection.
+    """
+    def __init__(self, max_points=30, min_points=4):
+        self.max_points = max_points
+        self.min_points = min_points
+        self.prev_gray = None
+        self.tracks = []  # [box, points]
+        self.lost = False
+
+    def reset(self, gray, boxes):
+        self.prev_gray = gray
+        self.tracks = []
+        self.lost = False
+        for (x, y, w, h) in boxes:
+            mask = np.zeros_like(gray)
+            mask[max(0, y):y+h, max(0, x):x+w] = 255
+            points = cv2.goodFeaturesToTrack(gray, self.max_points, 0.01, 5, mask=mask)
+            if points is None or len(points) < self.min_points:
+                points = None
+            self.tracks.append([(x, y, w, h), points])
+
+    def update(self, gray):
+        """New box for each track in order, None for tracks lost in this frame."""
+        boxes = []
+        kept = []
+        for box, points in self.tracks:
+            if points is None:
+                kept.append([box, None])
+                boxes.append(box)
+                continue
+            new_box = None
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None,
+                                                              winSize=(15, 15), maxLevel=2)
+            good = status.ravel() == 1
+            if good.sum() >= self.min_points:
+                dx, dy = np.median((new_points[good] - points[good]).reshape(-1, 2), axis=0)
+                x, y, w, h = box
+                new_box = (int(round(x + dx)), int(round(y + dy)), w, h)
+                kept.append([new_box, new_points[good].reshape(-1, 1, 2)])
+            if new_box is None:
+                self.lost = True
+            boxes.append(new_box)
+        self.tracks = kept
+        self.prev_gray = gray
+        return boxes
+
+class StageTimer:
+    """Moving average of milliseconds spent per pipeline stage."""
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.ms = {}
+
+    def record(self, stage, seconds):
+        ms = seconds * 1000
+        self.ms[stage] = ms if stage not in self.ms else self.ms[stage] + self.smoothing * (ms - self.ms[stage])
+
+    def stage(self, stage):
+        timer = self
+
+        class _Stage:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.record(stage, time.perf_counter() - self.start)
+        return _Stage()
+
+    def summary(self):
+        return "  ".join(f"{stage} {ms:.1f}ms" for stage, ms in self.ms.items())
+
+def draw_stats(frame, lines):
+    for i, line in enumerate(lines):
+        y = 20 + 22 * i
+        cv2.putText(frame, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 3)
+        cv2.putText(frame, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 0), 1)
 
 def main():
+    parser = argparse.ArgumentParser(description="Real-time face recognition")
+    parser.add_argument('--detector', default='mtcnn', choices=sorted(DETECTORS), help="Face detector backend")
+    parser.add_argument('--detect-every', type=int, default=5,
+                        help="Run full detection every N frames; boxes are tracked in between")
+    parser.add_argument('--dnn-model', default='res10_300x300_ssd_iter_140000.caffemodel', help="Caffe model for --detector dnn")
+    parser.add_argument('--dnn-config', default='deploy.prototxt', help="Prototxt for --detector dnn")
+    args = parser.parse_args()
+
     known_faces_dir = 'known_faces'
     encodings_dir = 'encodings'
-    unknown_faces_dir = 'unknown_faces'
 
-    for directory in [known_faces_dir, encodings_dir, unknown_faces_dir]:
+    for directory in [known_faces_dir, encodings_dir]:
         if not os.path.exists(directory):
             os.makedirs(directory)
 
     build_encodings(known_faces_dir, encodings_dir)
-    known_encodings = load_known_encodings(encodings_dir)
-    print(f"Loaded encodings for {len(known_encodings)} people.")
+    gallery = Gallery(load_known_encodings(encodings_dir))
+    print(f"Loaded encodings for {len(gallery)} people.")
 
     video_capture = cv2.VideoCapture(0)
     if not video_capture.isOpened():
         print("Error: Could not open video stream.")
         return
 
-    detector = MTCNN()
-    unknown_faces = []
+    if args.detector == 'dnn':
+        detector = create_detector('dnn', model_path=args.dnn_model, config_path=args.dnn_config)
+    else:
+        detector = create_detector(args.detector)
     MAX_FRAMES = 20
+    # Unknown faces are grouped per person and labeled in the background
+    unknown_clusters = UnknownClusters(min_size=MAX_FRAMES)
+    enroller = Enroller(gallery, unknown_clusters, known_faces_dir, encodings_dir)
+
+    # Full detection + recognition every N frames (or when a track is lost), optical flow in between
+    detect_every = max(1, args.detect_every)
+    flow = FlowTracker()
+    timer = StageTimer()
+    tracked = []  # (box, name) carried between detections
+    frames_since_detect = detect_every
+    detect_reason = ''
+    detections_done = 0
     frame_count = 0
-    SKIP_FRAMES = 2
+    fps = 0.0
+    last_frame = time.perf_counter()
     print("Starting video stream. Press 'q' to quit.")
 
     while True:
@@ -133,67 +581,70 @@ def main():
             break
 
         frame_count += 1
-        if frame_count % SKIP_FRAMES != 0:
-            continue
+        frames_since_detect += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        detections = detector.detect_faces(rgb_frame)
-        faces = []
-        for detection in detections:
-            x, y, w, h = detection['box']
-            x, y = max(0, x), max(0, y)
-            faces.append((x, y, w, h))
-
-        for (x, y, w, h) in faces:
-            face_img = frame[y:y+h, x:x+w]
-            face_encoding = extract_features_from_frame(face_img)
-            if face_encoding is None:
-                continue
+        if frames_since_detect >= detect_every or flow.lost:
+            detect_reason = 'track lost' if flow.lost and frames_since_detect < detect_every else 'scheduled'
+            frames_since_detect = 0
+            detections_done += 1
 
-            name = recognize_face(face_encoding, known_encodings)
-
-            if name == "Unknown":
-                unknown_faces.append(face_img)
-                if len(unknown_faces) >= MAX_FRAMES:
-                    timestamp = int(time.time())
-                    for idx, img in enumerate(unknown_faces):
-                        img_path = os.path.join(unknown_faces_dir, f"unknown_{timestamp}_{idx}.jpg")
-                        cv2.imwrite(img_path, img)
-                    
-                    print("Unknown face detected. Prompting for label...")
-                    person_name = prompt_user_for_name()
-                    
-                    if person_name:
-                        person_dir = os.path.join(known_faces_dir, person_name)
-                        if not os.path.exists(person_dir):
-                            os.makedirs(person_dir)
-                        
-                        for img_name in os.listdir(unknown_faces_dir):
-                            if img_name.startswith(f"unknown_{timestamp}_"):
-                                src_path = os.path.join(unknown_faces_dir, img_name)
-                                dest_path = os.path.join(person_dir, img_name.replace(f"unknown_{timestamp}_", ""))
-                                os.rename(src_path, dest_path)
-                        
-                        build_encodings(known_faces_dir, encodings_dir)
-                        known_encodings = load_known_encodings(encodings_dir)
-                        print(f"Added {person_name} to known faces.")
-                    else:
-                        print("No name entered. Unknown face not added.")
-                    
-                    unknown_faces = []
-            
+            with timer.stage('detect'):
+                detections = detector.detect(frame)
+            faces = []
+            face_images = []
+            for (x, y, w, h) in detections:
+                x, y = max(0, x), max(0, y)
+                # Copy, since the boxes drawn later would otherwise end up in the crops
+                face_img = frame[y:y+h, x:x+w].copy()
+                if face_img.size == 0:
+                    continue
+                faces.append((x, y, w, h))
+                face_images.append(face_img)
+
+            # One forward pass for every face in the frame
+            with timer.stage('embed'):
+                face_encodings = extract_features_batch(face_images)
+            with timer.stage('match'):
+                names = gallery.match(face_encodings)
+
+            for face_img, face_encoding, name in zip(face_images, face_encodings, names):
+                if name == "Unknown":
+                    cluster = unknown_clusters.add(face_encoding, face_img)
+                    if cluster is not None:
+                        print("Unknown face detected. Prompting for label...")
+                        enroller.submit(cluster)
+
+            flow.reset(gray, faces)
+            tracked = list(zip(faces, names))
+        else:
+            with timer.stage('track'):
+                boxes = flow.update(gray)
+            tracked = [(box, name) for box, (_, name) in zip(boxes, tracked) if box is not None]
+
+        for (x, y, w, h), name in tracked:
             color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
             cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
             cv2.rectangle(frame, (x, y-30), (x+w, y), color, cv2.FILLED)
             font = cv2.FONT_HERSHEY_SIMPLEX
             cv2.putText(frame, name, (x+5, y-10), font, 0.8, (255, 255, 255), 2)
 
+        now = time.perf_counter()
+        fps += 0.1 * (1.0 / max(now - last_frame, 1e-6) - fps)
+        last_frame = now
+        draw_stats(frame, [
+            f"{fps:.1f} FPS  {detector.name} every {detect_every} frames, "
+            f"{detections_done / frame_count:.2f} detections/frame (last: {detect_reason})",
+            timer.summary(),
+        ])
+
         cv2.imshow('Face Recognition', frame)
 
         if cv2.waitKey(1) & 0xFF == ord('q'):
             print("Quitting...")
             break
 
+    enroller.stop()
     video_capture.release()
     cv2.destroyAllWindows()
 